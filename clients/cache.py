@@ -0,0 +1,78 @@
+from collections import OrderedDict
+from django.core.cache import cache
+from django.db import transaction
+from .models import Client, LoanProfile
+
+#long enough to outlive a USSD session, the receivers drop it on any change
+TIMEOUT = 10*60
+
+
+class ClientProfile:
+    """The client, their active products and their loan profiles, as read
+    by the USSD screens on every hop."""
+
+    def __init__(self,client,products,loan_profiles):
+        self.client = client
+        self.products = products
+        self.loan_profiles = loan_profiles
+
+    @classmethod
+    def build(cls,msisdn):
+        client = Client.objects.filter(is_active=True,msisdn=msisdn).first()
+        if client is None:
+            return None
+        products = OrderedDict(
+            (p.pk,p) for p in client.products.filter(is_active=True).order_by('id'))
+        loan_profiles = {}
+        for profile in LoanProfile.objects.filter(client=client).order_by('id'):
+            profile.client = client
+            if profile.product_id in products:
+                profile.product = products[profile.product_id]
+            loan_profiles[profile.product_id] = profile
+        return cls(client,products,loan_profiles)
+
+    def get_products_menu(self):
+        return [(p.name,p.pk) for p in self.products.values()]
+
+    def get_product(self,pk):
+        product = self.products.get(pk)
+        if product is None:
+            from products.models import Product
+            product = Product.objects.get(pk=pk)
+        return product
+
+    def get_loan_profile(self,product_id):
+        profile = self.loan_profiles.get(product_id)
+        if profile is None:
+            profile = LoanProfile.objects.select_related('product').get(
+                product_id=product_id,client=self.client)
+        return profile
+
+
+def get_key(msisdn):
+    return 'client_profile:%s' % msisdn
+
+
+def get_client_profile(msisdn):
+    """The `ClientProfile` of the active client with this msisdn, or None.
+
+    Read through the cache, so it is built once per session at most.
+    """
+    key = get_key(msisdn)
+    profile = cache.get(key)
+    if profile is None:
+        #False marks a number that isn't an active client
+        profile = ClientProfile.build(msisdn) or False
+        cache.set(key,profile,TIMEOUT)
+    return profile or None
+
+
+def invalidate(*msisdns):
+    """Drop the cached profiles once the current transaction commits."""
+    keys = [get_key(m) for m in set(msisdns) if m]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_clients(client_ids):
+    invalidate(*Client.objects.filter(pk__in=client_ids).values_list('msisdn',flat=True))
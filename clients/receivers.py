@@ -0,0 +1,35 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from products.models import Product
+from .models import Client, LoanProfile
+from . import cache
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+def _invalidate_client(sender, instance=None, **kw):
+    cache.invalidate(instance.msisdn)
+
+
+@receiver(post_save, sender=LoanProfile)
+@receiver(post_delete, sender=LoanProfile)
+def _invalidate_loan_profile(sender, instance=None, **kw):
+    cache.invalidate_clients([instance.client_id])
+
+
+@receiver(m2m_changed, sender=Client.products.through)
+def _invalidate_client_products(sender, instance=None, action=None, reverse=False, pk_set=None, **kw):
+    if reverse and action == 'pre_clear':
+        #the clients of a cleared product are only known before the clear
+        cache.invalidate_clients(list(instance.products.values_list('pk',flat=True)))
+    elif action in ('post_add','post_remove','post_clear'):
+        if reverse:
+            cache.invalidate_clients(pk_set or ())
+        else:
+            cache.invalidate(instance.msisdn)
+
+
+@receiver(post_save, sender=Product)
+def _invalidate_product(sender, instance=None, created=False, **kw):
+    if not created:
+        cache.invalidate_clients(list(instance.products.values_list('pk',flat=True)))
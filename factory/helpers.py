@@ -1,33 +1,59 @@
 from loans.models import Application,ApplicationStatusEnum, Loan
 from clients.models import Client, LoanProfile
-from datetime import date
+import operator
+from functools import reduce
 from django.conf import settings
-from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
 import requests
 from requests.auth import HTTPBasicAuth
 from payments.models import Checkout
 from funds.models import Fund
+from products.pricing import get_interest
 # from wallets.models import Cash
 from transactions.models import Transaction
+from .tokens import TokenCache
+from .sequences import DailySequence
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
+APPLICATION_CODE_ATTEMPTS = 3
+
+TOKEN_TIMEOUT = (5,15) #connect, read
+
+
+def get_application_code_seed(prefix):
+    """The highest counter among the application codes issued under `prefix`."""
+    prefix = int(prefix)
+    #one range per counter length, each served by the unique index on code
+    ranges = [models.Q(code__gte=prefix*10**n,code__lt=(prefix+1)*10**n) for n in range(1,8)]
+    code = Application.all_objects.filter(reduce(operator.or_,ranges)).aggregate(code=models.Max('code'))['code']
+    return int(str(code)[6:]) if code else 0
+
+
 class Helpers:
     def create_loan_application(self,client,product,amount,period):
-        code = self.get_loan_application_next_code()
         if amount > settings.AUTO_APPROVE_CEILING:
             status = ApplicationStatusEnum.PENDING
         else:
             status = ApplicationStatusEnum.APPROVED
 
-        return Application.objects.create(
-                client = client,
-                product = product,
-                amount = amount,
-                duration = period,
-                code = code,
-                status=status)
+        for attempt in range(APPLICATION_CODE_ATTEMPTS):
+            code = self.get_loan_application_next_code()
+            try:
+                with transaction.atomic():
+                    return Application.objects.create(
+                            client = client,
+                            product = product,
+                            amount = amount,
+                            duration = period,
+                            code = code,
+                            status=status)
+            except IntegrityError:
+                #the counter fell behind the table, e.g. the cache was flushed
+                if attempt + 1 == APPLICATION_CODE_ATTEMPTS:
+                    raise
+                application_codes.reseed()
 
     def get_latest_loan_application(self):
         try:
@@ -40,17 +66,7 @@ class Helpers:
 
 
     def get_loan_application_next_code(self):
-        today = date.today().isoformat()
-        year, month, day = str(today).split('-')
-
-        today_code = str(year)[2:] +  str(month) + str(day)
-        next_code = today_code + '1'
-
-        latest = self.get_latest_loan_application()
-        if latest and (today_code == str(latest.code)[:6]):
-            next_code = latest.code + 1
-
-        return int(next_code)
+        return application_codes.next()
 
     def get_client_product_loan_profile(self,client,product):
         return LoanProfile.objects.filter(client=client,product=product).last()
@@ -63,28 +79,24 @@ class Helpers:
             client = None
         return client
     def generate_token(self):
-        # if cache.get('access_token'):
-        #     token = cache.get('access_token').encode('utf-8')
-        #     return token
-        # else:
+        return mpesa_token.get()
 
+    def fetch_token(self):
         consumer_key = settings.VARIABLES.get('CONSUMER_KEY')
         consumer_secret = settings.VARIABLES.get('CONSUMER_SECRET')
-        r = requests.get(settings.VARIABLES.get('TOKEN_URL'), auth=HTTPBasicAuth(consumer_key, consumer_secret))
+        #well inside the refresh lock's timeout, see TokenCache
+        r = requests.get(settings.VARIABLES.get('TOKEN_URL'), auth=HTTPBasicAuth(consumer_key, consumer_secret),timeout=TOKEN_TIMEOUT)
         token=r.json()
-        access_token = token.get('access_token')
-        cache.set('access_token',access_token,1700)
-        return token.get('access_token')
+        return token.get('access_token'), token.get('expires_in')
     
     def create_checkout(self,amount,ref_no,msisdn):
         return Checkout.objects.create(amount=amount,ref_no=ref_no,msisdn=msisdn)
 
     def is_loan_product_fund_sufficient(self,application):
-        return application.product.fund.balance > application.amount
+        return application.product.fund.available_balance > application.amount
 
     def calculate_interest(self,application):
-        interest = (application.amount*application.product.interest_rate*application.duration)//100
-        return interest
+        return get_interest(application.amount,application.product.interest_rate,application.duration)
     # def add_new_client_wallet(self,client):
     #     if not hasattr(client, "cash"):
     #         client.cash = Cash.objects.create(client=client)
@@ -113,3 +125,7 @@ class Helpers:
 
 helpers = Helpers()
 
+mpesa_token = TokenCache('mpesa',helpers.fetch_token)
+
+application_codes = DailySequence('application_code',get_application_code_seed)
+
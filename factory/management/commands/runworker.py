@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from factory import workers
+
+
+class Command(BaseCommand):
+    help = ('Runs the worker of a queue until it receives SIGTERM or SIGINT. '
+        'Several can run per queue; each claims the rows it handles.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queue', help='One of: %s' % ', '.join(workers.get_queues()))
+        parser.add_argument('--batch-size', type=int, help='Rows fetched per batch.')
+        parser.add_argument('--concurrency', type=int, help='Items handled in parallel within a batch.')
+
+    def handle(self, *args, **options):
+        try:
+            worker = workers.get_worker(options['queue'])
+        except LookupError as exc:
+            raise CommandError(str(exc))
+        worker(
+            batch_size=options['batch_size'],
+            concurrency=options['concurrency'],
+            ).run()
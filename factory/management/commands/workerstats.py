@@ -0,0 +1,14 @@
+import json
+from django.core.management.base import BaseCommand
+from factory import workers
+
+
+class Command(BaseCommand):
+    help = 'Prints the latest throughput and latency snapshot of each running worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queues', nargs='*', help='Queues to report on. Defaults to all.')
+
+    def handle(self, *args, **options):
+        stats = {q: workers.get_stats(q) for q in options['queues'] or workers.get_queues()}
+        self.stdout.write(json.dumps(stats, indent=2))
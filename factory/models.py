@@ -1,4 +1,6 @@
-from django.db import models
+import random
+from datetime import timedelta
+from django.db import models, transaction
 from django.utils import timezone
 from .managers import SoftDeletionManager
 from django.conf import settings
@@ -24,6 +26,98 @@ class FactoryModel(models.Model):
     def hard_delete(self):
         super(FactoryModel, self).delete()
 
+    @classmethod
+    def lock(cls, items, **filters):
+        """Lock the rows of `items` that still match `filters` until the
+        current transaction ends, and return those items.
+
+        Rows locked by a concurrent batch are skipped rather than waited on,
+        and rows it has already moved out of `filters` no longer match, so a
+        worker that handles its batch inside one transaction can run side by
+        side with others on the same queue.
+        """
+        ids = set(
+            cls.objects.select_for_update(skip_locked=True)
+            .filter(pk__in=[item.pk for item in items], **filters)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+            )
+        return [item for item in items if item.pk in ids]
+
+
+class RetryModel(models.Model):
+    """Retry bookkeeping for rows drained by a queue worker.
+
+    The model's `status` enum must define PENDING and DEAD. A retryable
+    failure puts the row back to PENDING with `next_attempt_at` pushed out
+    by a jittered exponential backoff; once `settings.RETRY_MAX_ATTEMPTS`
+    is used up the row is dead-lettered instead. Models with other limits
+    override `get_backoff()` and `get_max_attempts()`.
+
+    Workers lease their batches with `claim_unprocessed()`, so several can
+    drain the same queue while the rows are sent outside a transaction.
+    """
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=64,null=True,blank=True)
+    lease_expires_at = models.DateTimeField(null=True,blank=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def due(cls):
+        status = cls._meta.get_field('status').enum
+        return cls.objects.filter(status=status.PENDING,next_attempt_at__lte=timezone.now())
+
+    @classmethod
+    def claim_unprocessed(cls,limit,worker,lease):
+        """Lease up to `limit` due rows to `worker` for `lease` seconds.
+
+        Rows locked by a concurrent claim are skipped rather than waited on.
+        A row whose lease has expired (its worker died mid-batch) is
+        claimable again, as is a retried one once its `next_attempt_at` is
+        due.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            ids = list(
+                cls.due().select_for_update(skip_locked=True)
+                .filter(models.Q(lease_expires_at__isnull=True)|models.Q(lease_expires_at__lt=now))
+                .order_by('next_attempt_at','id')
+                .values_list('id',flat=True)[:limit]
+                )
+            cls.objects.filter(id__in=ids).update(
+                claimed_by=worker,
+                lease_expires_at=now + timedelta(seconds=lease))
+
+        return cls.objects.filter(id__in=ids,claimed_by=worker).order_by('next_attempt_at','id')
+
+    def release(self):
+        """Clear the lease; saved together with the outcome of the row."""
+        self.claimed_by = None
+        self.lease_expires_at = None
+
+    @staticmethod
+    def get_backoff(attempts):
+        delay = min(settings.RETRY_MAX_DELAY,settings.RETRY_BASE_DELAY * 2 ** (attempts - 1))
+        return delay/2 + random.uniform(0,delay/2) #spread retries of a failed batch
+
+    def get_max_attempts(self):
+        return settings.RETRY_MAX_ATTEMPTS
+
+    def retry(self,notes):
+        """Requeue after a transient failure. Returns False once dead-lettered."""
+        status = self._meta.get_field('status').enum
+        self.attempts += 1
+        self.notes = notes
+        if self.attempts >= self.get_max_attempts():
+            self.status = status.DEAD
+            return False
+        self.status = status.PENDING
+        self.next_attempt_at = timezone.now() + timedelta(seconds=self.get_backoff(self.attempts))
+        return True
+
 
 @export()
 class QuerySet(models.QuerySet):
@@ -0,0 +1,90 @@
+"""Wake-up notifications for the queue workers (see `factory.workers`).
+
+Saving a row that a worker has to pick up publishes on a redis channel
+named after its queue; a worker blocked in `QueueListener.wait()` returns
+as soon as one arrives instead of sleeping out its poll interval. When the
+cache isn't redis, `wait()` falls back to a plain sleep.
+"""
+import time
+import logging
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'JL_QUEUE:'
+
+APPLICATIONS = 'applications'
+CHECKOUTS = 'checkouts'
+PAYOUTS = 'payouts'
+PAYINS = 'payins'
+CALLBACKS = 'callbacks'
+PUSHBACKS = 'pushbacks'
+
+
+def get_redis():
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except (ImportError, NotImplementedError):
+        return None
+
+
+def channel(queue):
+    return CHANNEL_PREFIX + queue
+
+
+def publish(queue):
+    conn = get_redis()
+    if conn is None:
+        return
+    try:
+        conn.publish(channel(queue), 1)
+    except Exception as exc:
+        #the poll interval still picks the row up; never fail a save over this
+        logger.warning(f'{repr(exc)}')
+
+
+def notify(queue):
+    """Wake the workers of `queue` once the current transaction commits."""
+    transaction.on_commit(lambda: publish(queue))
+
+
+class QueueListener:
+
+    def __init__(self,*queues):
+        self.queues = queues
+        self.pubsub = None
+        conn = get_redis()
+        if conn is not None:
+            #subscribe before the first poll so nothing published in between is lost
+            self.pubsub = conn.pubsub(ignore_subscribe_messages=True)
+            self.pubsub.subscribe(*(channel(q) for q in queues))
+
+    def wait(self,timeout):
+        """Block until one of the queues is notified or `timeout` seconds pass.
+
+        Returns True when woken by a notification.
+        """
+        if self.pubsub is None:
+            time.sleep(timeout)
+            return False
+
+        deadline = time.time() + timeout
+        try:
+            while True:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                if self.pubsub.get_message(timeout=remaining) is not None:
+                    #a burst of saves needs a single wake-up
+                    while self.pubsub.get_message() is not None:
+                        pass
+                    return True
+        except Exception as exc:
+            logger.warning(f'{repr(exc)}')
+            time.sleep(max(deadline - time.time(),0))
+            return False
+
+    def close(self):
+        if self.pubsub is not None:
+            self.pubsub.close()
@@ -0,0 +1,39 @@
+from datetime import date
+from django.core.cache import cache
+
+
+class DailySequence:
+    """Codes made of a yymmdd prefix followed by a counter that restarts daily.
+
+    The counter lives in the django cache (redis), so taking the next code is
+    a single INCR shared by every process. The first caller of the day seeds
+    it from `seed(prefix)`, the highest counter already stored for that day.
+    """
+
+    def __init__(self,name,seed,timeout=2*24*60*60):
+        self.name = name
+        self.seed = seed
+        self.timeout = timeout
+
+    def get_prefix(self):
+        return date.today().strftime('%y%m%d')
+
+    def get_key(self,prefix):
+        return 'sequence:%s:%s' % (self.name,prefix)
+
+    def next(self):
+        prefix = self.get_prefix()
+        key = self.get_key(prefix)
+        try:
+            counter = cache.incr(key)
+        except ValueError:
+            #add() only sets the key if nobody else seeded it first
+            cache.add(key,self.seed(prefix),self.timeout)
+            counter = cache.incr(key)
+        return int(prefix + str(counter))
+
+    def reseed(self):
+        """Reset today's counter from the stored codes, e.g. after the cache
+        was flushed and a code came out taken."""
+        prefix = self.get_prefix()
+        cache.set(self.get_key(prefix),self.seed(prefix),self.timeout)
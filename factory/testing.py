@@ -0,0 +1,59 @@
+from decimal import Decimal
+from django.db import connection
+
+
+class QueryPlanMixin:
+    """Assertions on the plan the database picks for a queryset."""
+
+    def explain(self,queryset):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                #an empty test table is cheaper to scan; ask for the plan
+                #the planner would use on a populated one
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def assertUsesIndex(self,queryset,index_name):
+        plan = self.explain(queryset)
+        self.assertIn(index_name,plan,'%s not used by:\n%s' % (index_name,plan))
+
+
+class LoanFixturesMixin:
+    """The smallest set of rows a loan goes through: an officer and center,
+    a funded product with a charge, and clients with loan profiles."""
+
+    def create_product(self,fund_balance=100000,charge=50):
+        from users.models import User
+        from organisations.models import Organisation,Center
+        from funds.models import Fund
+        from charges.models import Charge
+        from products.models import Product
+
+        self.officer = User.objects.create(msisdn='254700000000',first_name='a',last_name='b')
+        organisation = Organisation.objects.create(name='org',contact_email='a@b.c',address='x',manager=self.officer)
+        self.center = Center.objects.create(name='c',contact_email='a@b.c',address='x',
+            manager=self.officer,organisation=organisation)
+        fund = Fund.objects.create(name='f',description='d',balance=fund_balance)
+        product = Product.objects.create(name='p',short_name='p',minimum_principal=100,maximum_principal=10000,
+            interest_rate=Decimal('10'),max_repayment_months=3,fund=fund)
+        product.charges.add(Charge.objects.create(name='fee',amount=charge))
+        return product
+
+    def create_client(self,product,limit=5000,profile=True,is_active=True):
+        from clients.models import Client,LoanProfile
+
+        n = Client.objects.count()
+        client = Client.objects.create(msisdn='+2547110000%02d' % n,first_name='c%d' % n,last_name='x',id_no=n,
+            is_active=is_active,officer=self.officer,center=self.center)
+        client.products.add(product)
+        if profile:
+            LoanProfile.objects.create(client=client,product=product,loan_limit=limit,available_limit=limit,
+                minimum_principle=100,is_active=True)
+        return client
+
+    def create_application(self,client,product,amount,duration=1,**kwargs):
+        from loans.models import Application,ApplicationStatusEnum
+
+        kwargs.setdefault('status',ApplicationStatusEnum.APPROVED)
+        kwargs.setdefault('code',Application.all_objects.count() + 1)
+        return Application.objects.create(client=client,product=product,amount=amount,duration=duration,**kwargs)
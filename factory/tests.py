@@ -0,0 +1,145 @@
+import time
+import threading
+from unittest import mock
+from django.core.cache import cache
+from django.test import SimpleTestCase,TestCase
+from .helpers import get_application_code_seed
+from .sequences import DailySequence
+from .testing import LoanFixturesMixin
+from .tokens import TokenCache,TokenError
+
+# Create your tests here.
+
+
+class TokenCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.fetches = 0
+
+    def fetch(self,token='t1',expires_in=3600,delay=0):
+        def fetch():
+            self.fetches += 1
+            time.sleep(delay)
+            return token,expires_in
+        return fetch
+
+    def test_a_token_is_fetched_once_and_reused(self):
+        tokens = TokenCache('test',self.fetch())
+        self.assertEqual(tokens.get(),'t1')
+        self.assertEqual(tokens.get(),'t1')
+        self.assertEqual(self.fetches,1)
+
+    def test_other_processes_use_the_shared_token(self):
+        TokenCache('test',self.fetch()).get()
+        self.assertEqual(TokenCache('test',self.fetch('t2')).get(),'t1')
+        self.assertEqual(self.fetches,1)
+
+    def test_concurrent_callers_fetch_a_single_token(self):
+        tokens = TokenCache('test',self.fetch(delay=0.2))
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(tokens.get())) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results,['t1'] * 10)
+        self.assertEqual(self.fetches,1)
+
+    def test_waiters_get_the_token_another_process_fetches(self):
+        tokens = TokenCache('test',self.fetch('t2'),lock_timeout=5)
+        cache.add(tokens.lock_key,1) #another process is refreshing
+        threading.Timer(0.2,lambda: cache.set(tokens.key,('t1',time.time() + 3600))).start()
+        self.assertEqual(tokens.get(),'t1')
+        self.assertEqual(self.fetches,0)
+
+    def test_a_token_about_to_expire_is_refreshed_ahead(self):
+        tokens = TokenCache('test',self.fetch('t2'),refresh_ahead=120)
+        cache.set(tokens.key,('t1',time.time() + 60))
+        self.assertEqual(tokens.get(),'t2')
+        self.assertEqual(self.fetches,1)
+
+    def test_a_token_about_to_expire_is_used_while_another_process_refreshes_it(self):
+        tokens = TokenCache('test',self.fetch('t2'),refresh_ahead=120)
+        cache.set(tokens.key,('t1',time.time() + 60))
+        cache.add(tokens.lock_key,1)
+        self.assertEqual(tokens.get(),'t1')
+        self.assertEqual(self.fetches,0)
+
+    def test_the_ttl_is_capped_by_expires_in(self):
+        tokens = TokenCache('test',self.fetch(expires_in=200),ttl=1700,refresh_ahead=120)
+        tokens.get()
+        self.assertLessEqual(cache.get(tokens.key)[1],time.time() + 200)
+
+    def test_a_missing_token_raises_and_is_not_cached(self):
+        tokens = TokenCache('test',self.fetch(token=None))
+        with self.assertRaises(TokenError):
+            tokens.get()
+        self.assertIsNone(cache.get(tokens.key))
+        self.assertIsNone(cache.get(tokens.lock_key))
+
+    def test_clear_drops_the_token(self):
+        tokens = TokenCache('test',self.fetch())
+        tokens.get()
+        tokens.clear()
+        tokens.get()
+        self.assertEqual(self.fetches,2)
+
+
+class DailySequenceTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.seeds = []
+
+    def get_sequence(self,seeds):
+        def seed(prefix):
+            self.seeds.append(prefix)
+            return seeds.get(prefix,0)
+        return DailySequence('test',seed)
+
+    def on(self,sequence,prefix):
+        return mock.patch.object(sequence,'get_prefix',return_value=prefix)
+
+    def test_codes_follow_the_seed(self):
+        sequence = self.get_sequence({'261018':41})
+        with self.on(sequence,'261018'):
+            self.assertEqual([sequence.next(),sequence.next()],[26101842,26101843])
+        self.assertEqual(self.seeds,['261018'])
+
+    def test_the_counter_restarts_every_day(self):
+        sequence = self.get_sequence({'261018':41})
+        with self.on(sequence,'261018'):
+            sequence.next()
+        with self.on(sequence,'261019'):
+            self.assertEqual([sequence.next(),sequence.next()],[2610191,2610192])
+        with self.on(sequence,'261018'):
+            #the previous day's counter is left where it was
+            self.assertEqual(sequence.next(),26101843)
+        self.assertEqual(self.seeds,['261018','261019'])
+
+    def test_processes_share_the_counter(self):
+        a,b = self.get_sequence({}),self.get_sequence({})
+        with self.on(a,'261018'),self.on(b,'261018'):
+            self.assertEqual([a.next(),b.next(),a.next()],[2610181,2610182,2610183])
+        self.assertEqual(self.seeds,['261018'])
+
+    def test_reseed_restarts_from_the_stored_codes(self):
+        seeds = {}
+        sequence = self.get_sequence(seeds)
+        with self.on(sequence,'261018'):
+            sequence.next()
+            seeds['261018'] = 7
+            sequence.reseed()
+            self.assertEqual(sequence.next(),2610188)
+
+
+class ApplicationCodeSeedTests(LoanFixturesMixin,TestCase):
+
+    def test_the_seed_is_the_highest_counter_of_the_day(self):
+        product = self.create_product()
+        client = self.create_client(product)
+        for code in (2610189,26101812,2610183,26101799,2610191):
+            self.create_application(client,product,1000,code=code)
+        self.assertEqual(get_application_code_seed('261018'),12)
+        self.assertEqual(get_application_code_seed('261020'),0)
@@ -0,0 +1,84 @@
+import time
+import threading
+from django.core.cache import cache
+
+
+class TokenError(Exception):
+    pass
+
+
+class TokenCache:
+    """Access token cache shared by every worker.
+
+    Tokens are kept in process memory and in the django cache (redis) with
+    their expiry. Once a token is within `refresh_ahead` seconds of expiring,
+    a single caller, across all processes, fetches a new one while everybody
+    else keeps using the current token until it actually expires.
+    """
+
+    def __init__(self,name,fetch,ttl=1700,refresh_ahead=120,lock_timeout=30):
+        self.key = 'access_token:%s' % name
+        self.lock_key = '%s:refresh' % self.key
+        self.fetch = fetch
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.lock_timeout = lock_timeout
+        self._token = None
+        self._lock = threading.Lock()
+
+    def _fresh(self,token,now):
+        return token is not None and now < token[1] - self.refresh_ahead
+
+    def _valid(self,token,now):
+        return token is not None and now < token[1]
+
+    def get(self):
+        now = time.time()
+        token = self._token
+        if self._fresh(token,now):
+            return token[0]
+
+        with self._lock:
+            token = self._token
+            if self._fresh(token,now):
+                return token[0]
+
+            shared = cache.get(self.key)
+            if self._fresh(shared,now):
+                self._token = shared
+                return shared[0]
+
+            if cache.add(self.lock_key,1,self.lock_timeout):
+                try:
+                    return self.refresh()
+                finally:
+                    cache.delete(self.lock_key)
+
+            #another process is refreshing. the current token is still good.
+            if self._valid(shared,now):
+                self._token = shared
+                return shared[0]
+
+            deadline = now + self.lock_timeout
+            while time.time() < deadline:
+                time.sleep(0.1)
+                shared = cache.get(self.key)
+                if self._valid(shared,time.time()):
+                    self._token = shared
+                    return shared[0]
+
+            return self.refresh()
+
+    def refresh(self):
+        access_token, expires_in = self.fetch()
+        if not access_token:
+            #never cached, or every request would carry a bad token until it expires
+            raise TokenError('No access token in the response for %s' % self.key)
+        ttl = min(int(expires_in or self.ttl),self.ttl)
+        self._token = token = (access_token,time.time() + ttl)
+        cache.set(self.key,token,ttl)
+        return access_token
+
+    def clear(self):
+        self._token = None
+        cache.delete(self.key)
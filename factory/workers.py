@@ -0,0 +1,284 @@
+"""Shared runtime for the queue workers.
+
+A worker drains one queue in batches: `fetch()` returns the next batch and
+`process()` handles it. `run()` supplies the loop, the idle wait on the
+queue's notification channel, graceful shutdown and metrics. Workers are
+declared in each app's `workers` module with `@register` and started with
+`manage.py runworker <queue>`.
+
+Any number of workers may run per queue, so no row may be handled by two
+of them. A worker that sends its rows outside a transaction leases them
+in `fetch()` with `claim()` (see `RetryModel.claim_unprocessed`). One that
+handles its batch in a single transaction locks the rows at the start of
+it with `FactoryModel.lock` and leaves out the ones it didn't get.
+"""
+import os
+import time
+import socket
+import signal
+import logging
+from importlib import import_module
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import module_has_submodule
+
+from . import notify
+
+logger = logging.getLogger(__name__)
+
+WORKERS_MODULE_NAME = 'workers'
+
+STATS_KEY_PREFIX = 'JL_WORKER_STATS:'
+
+_REGISTRY = {}
+
+
+def register(cls):
+    _REGISTRY[cls.queue] = cls
+    return cls
+
+
+def load_worker_modules():
+    for appconfig in apps.get_app_configs():
+        if module_has_submodule(appconfig.module, WORKERS_MODULE_NAME):
+            import_module('%s.%s' % (appconfig.name, WORKERS_MODULE_NAME))
+
+
+def get_worker(queue):
+    load_worker_modules()
+    try:
+        return _REGISTRY[queue]
+    except KeyError:
+        raise LookupError('Worker for queue "%s" not found' % queue)
+
+
+def get_queues():
+    load_worker_modules()
+    return sorted(_REGISTRY)
+
+
+def get_worker_id():
+    return '%s:%s' % (socket.gethostname(), os.getpid())
+
+
+class WorkerExit(BaseException):
+    #not an Exception, so the handlers around the idle wait don't swallow it
+    pass
+
+
+class Metrics:
+    """Throughput and latency counters for one worker process."""
+
+    def __init__(self, queue, worker_id):
+        self.queue = queue
+        self.worker_id = worker_id
+        self.started_at = time.time()
+        self.items = 0
+        self.batches = 0
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.window_items = 0
+        self.window_started_at = self.started_at
+        self.last_batch_time = None
+        self.last_wait_time = None
+        self.lags = 0
+        self.lag_time = 0.0
+        self.max_lag = None
+
+    def record_batch(self, items, duration, wait_time=None):
+        self.items += items
+        self.window_items += items
+        self.batches += 1
+        self.busy_time += duration
+        self.last_batch_time = duration
+        if wait_time is not None:
+            self.wait_time += wait_time
+            self.last_wait_time = wait_time / items
+
+    def record_lag(self, lag):
+        """Record the seconds between an item being queued and the worker
+        finishing it, retries included."""
+        self.lags += 1
+        self.lag_time += lag
+        self.max_lag = lag if self.max_lag is None else max(self.max_lag, lag)
+
+    def snapshot(self):
+        now = time.time()
+        window = max(now - self.window_started_at, 1e-6)
+        return dict(
+            worker=self.worker_id,
+            uptime=round(now - self.started_at, 1),
+            items=self.items,
+            batches=self.batches,
+            items_per_sec=round(self.window_items / window, 2),
+            avg_item_time=round(self.busy_time / self.items, 4) if self.items else None,
+            avg_queue_wait=round(self.wait_time / self.items, 2) if self.items else None,
+            last_batch_time=self.last_batch_time and round(self.last_batch_time, 4),
+            last_queue_wait=self.last_wait_time and round(self.last_wait_time, 2),
+            avg_lag=round(self.lag_time / self.lags, 2) if self.lags else None,
+            max_lag=self.max_lag and round(self.max_lag, 2),
+            updated_at=now,
+        )
+
+    def publish(self):
+        snapshot = self.snapshot()
+        logger.info('[%s] %s', self.queue, snapshot)
+        key = get_stats_key(self.queue)
+        try:
+            stats = cache.get(key) or {}
+            stats[self.worker_id] = snapshot
+            cache.set(key, stats, 24*60*60)
+        except Exception as exc:
+            logger.warning(f'{repr(exc)}')
+        self.window_items = 0
+        self.window_started_at = time.time()
+        self.max_lag = None
+        return snapshot
+
+
+def get_stats_key(queue):
+    return STATS_KEY_PREFIX + queue
+
+
+def get_stats(queue):
+    return cache.get(get_stats_key(queue)) or {}
+
+
+class Worker:
+    """Base class for queue workers.
+
+    Subclasses set `queue` and implement `fetch()` and `process()`. A
+    batch is always processed to the end; SIGTERM/SIGINT only stop the
+    loop between batches.
+
+    `fetch()` must not hand out rows another worker of the queue may be
+    handling: lease them with `claim()`, or lock them in `process()`.
+    """
+
+    queue = None
+
+    #worst case seconds to handle one item of a leased batch
+    item_timeout = None
+
+    batch_size = 50
+
+    concurrency = 1
+
+    stats_interval = 60
+
+    def __init__(self, batch_size=None, concurrency=None):
+        conf = getattr(settings, 'WORKERS', {}).get(self.queue, {})
+        self.batch_size = batch_size or conf.get('batch_size') or self.batch_size
+        self.concurrency = concurrency or conf.get('concurrency') or self.concurrency
+        self.idle_timeout = conf.get('idle_timeout') or settings.WORKER_IDLE_TIMEOUT
+        self.worker_id = get_worker_id()
+        self.metrics = Metrics(self.queue, self.worker_id)
+        self.running = False
+        self._busy = False
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        return self._executor
+
+    def get_lease(self, limit):
+        #outlasts the batch even when every item times out, so no row is
+        #reclaimed by another worker while it is still being handled
+        rounds = -(-limit // self.concurrency)
+        return settings.WORKER_LEASE_SECONDS + rounds * self.item_timeout
+
+    def claim(self, model, limit):
+        """Lease the next `limit` due rows of a `RetryModel` to this worker.
+
+        `process()` must `release()` each row before saving its outcome.
+        """
+        return model.claim_unprocessed(limit=limit, worker=self.worker_id, lease=self.get_lease(limit))
+
+    def fetch(self, limit):
+        raise NotImplementedError('fetch method for worker %s' \
+            % self.__class__.__name__)
+
+    def process(self, batch):
+        raise NotImplementedError('process method for worker %s' \
+            % self.__class__.__name__)
+
+    def submit(self, items, fn, *args):
+        """Run `fn(*args, item)` for each item on the worker's thread pool.
+
+        Yields `(item, future)` pairs as they complete. Only use this for
+        I/O that doesn't touch the database; record the results on the
+        calling thread.
+        """
+        futures = {self.executor.submit(fn, *(args + (item,))): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future
+
+    def get_queue_wait(self, batch):
+        now = timezone.now()
+        waits = [(now - item.created_at).total_seconds() for item in batch if hasattr(item, 'created_at')]
+        return sum(waits) if waits else None
+
+    def handle_signal(self, signum, frame):
+        logger.info('[%s] received signal %s, stopping.', self.queue, signum)
+        self.running = False
+        if not self._busy:
+            raise WorkerExit()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.handle_signal)
+        signal.signal(signal.SIGINT, self.handle_signal)
+
+    def run_once(self):
+        self._busy = True
+        try:
+            close_old_connections()
+            started = time.time()
+            batch = self.fetch(self.batch_size)
+            if batch:
+                wait = self.get_queue_wait(batch)
+                self.process(batch)
+                self.metrics.record_batch(len(batch), time.time() - started, wait)
+            return len(batch)
+        finally:
+            self._busy = False
+
+    def run(self):
+        self.install_signal_handlers()
+        listener = notify.QueueListener(self.queue)
+        last_stats = time.time()
+        self.running = True
+        logger.info('[%s] worker %s started. batch size %s, concurrency %s',
+            self.queue, self.worker_id, self.batch_size, self.concurrency)
+        try:
+            while self.running:
+                try:
+                    count = self.run_once()
+                except Exception:
+                    #e.g. the database or an endpoint is down; the batch's
+                    #rows are still queued, so wait and try again
+                    logger.exception('[%s] batch failed', self.queue)
+                    count = 0
+                if time.time() - last_stats >= self.stats_interval:
+                    self.metrics.publish()
+                    last_stats = time.time()
+                if not count and self.running:
+                    listener.wait(self.idle_timeout)
+        except WorkerExit:
+            pass
+        finally:
+            listener.close()
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self.metrics.publish()
+            logger.info('[%s] worker %s stopped.', self.queue, self.worker_id)
+
+
+def run_worker(queue, **options):
+    cls = get_worker(queue)
+    return cls(**options).run()
@@ -1,8 +1,6 @@
-import os
 from importlib import import_module
 from django.utils.module_loading import module_has_submodule
 from django.apps import AppConfig, apps
-from django.conf import settings
 
 from . import settings as ussd_settings
 
@@ -14,17 +12,9 @@ class UssdConfig(AppConfig):
 	label = 'flex_ussd'
 
 	def ready(self):
-		self.check_data_dir()
+		from . import checks
 		self.load_screen_modules()
 
-	def check_data_dir(self):
-		if not os.path.exists(settings.LOCAL_DATA_DIR):
-			os.mkdir(settings.LOCAL_DATA_DIR)
-			svn_content = """*
-			!.gitignore"""
-			with open(os.path.join(settings.LOCAL_DATA_DIR, '.gitignore'), 'w+') as f:
-				f.write(svn_content)
-
 	def load_screen_modules(self):
 		for appconfig in apps.get_app_configs():
 			if module_has_submodule(appconfig.module, SCREENS_MODULE_NAME):
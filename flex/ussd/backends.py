@@ -3,10 +3,13 @@ import hashlib
 import datetime
 from collections import namedtuple
 
+from asgiref.sync import sync_to_async
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
 from django.utils.functional import SimpleLazyObject
 
 from .utils import AttributeBag
+from .utils.decorators import cached_property
 from .settings import ussd_settings
 from .sessions import UssdSessionKey, UssdSession
 
@@ -26,6 +29,17 @@ class CacheBackend(object):
 	def get_session_timeout(self):
 		return ussd_settings.SESSION_TIMEOUT
 
+	@cached_property
+	def codec(self):
+		cls = ussd_settings.SESSION_CODEC
+		return cls and cls(ussd_settings.SESSION_CLASS)
+
+	def get_session_cache_key(self, key):
+		if self.codec is None:
+			return str(key.uid)
+		# versioned, so that nodes running another codec version don't read it
+		return '%s:%s:v%s' % (ussd_settings.SESSION_KEY_PREFIX, key.uid, self.codec.VERSION)
+
 	# def get_screen_state_timeout(self):
 	# 	return ussd_settings.SCREEN_STATE_TIMEOUT
 
@@ -50,10 +64,21 @@ class CacheBackend(object):
 		return cls(key)
 
 	def get_saved_session(self, key, request):
+		if self.codec is None:
+			return cache.get(key.uid)
+
+		data = cache.get(self.get_session_cache_key(key))
+		if data is not None:
+			return self.codec.loads(data)
+		# a session pickled before the codec was enabled
 		return cache.get(key.uid)
 
 	def save_session(self, session, request):
-		return cache.set(str(session.key.uid), session, self.get_session_timeout())
+		if self.codec is None:
+			return cache.set(str(session.key.uid), session, self.get_session_timeout())
+
+		return cache.set(self.get_session_cache_key(session.key),
+				self.codec.dumps(session), self.get_session_timeout())
 
 	def open_session(self, req):
 		key = self.get_session_key(req)
@@ -69,6 +94,15 @@ class CacheBackend(object):
 		session.finish_request(request)
 		self.save_session(session, request)
 
+	# The cache clients are blocking, the async variants run them on the
+	# executor's threads. Opening and saving a session doesn't touch the db.
+
+	async def aopen_session(self, req):
+		return await sync_to_async(self.open_session, thread_sensitive=False)(req)
+
+	async def aclose_session(self, session, request, response):
+		return await sync_to_async(self.close_session, thread_sensitive=False)(session, request, response)
+
 	# def get_saved_screen_state(self, session):
 	# 	return cache.get(self.get_screen_state_key(session))
 
@@ -79,6 +113,88 @@ class CacheBackend(object):
 	# 	cache.delete(self.get_screen_state_key(session))
 
 
+class HashHistoryStore(object):
+	"""History refs read with the session's hash and written back with it."""
+
+	__slots__ = ('codec', 'fields', 'pending')
+
+	def __init__(self, codec, fields):
+		self.codec = codec
+		self.fields = fields
+		self.pending = {}
+
+	def get(self, path):
+		if path in self.pending:
+			return self.pending[path]
+		data = self.fields.get(RedisHashBackend.history_field(path).encode())
+		return None if data is None else self.codec.loads_value(data)
+
+	def set(self, path, ref):
+		self.pending[path] = ref
+
+
+class RedisHashBackend(CacheBackend):
+	"""Keeps a session and its history refs in a single redis hash.
+
+	A request costs two round-trips whatever the number of screens it goes
+	through: an HGETALL when the session is opened and one pipeline, that
+	writes the session, the refs pushed during the request and the expiry,
+	when it is closed. Needs django_redis and a session codec.
+	"""
+
+	SESSION_FIELD = b's'
+
+	HISTORY_FIELD_PREFIX = 'h:'
+
+	@staticmethod
+	def history_field(path):
+		return '%s%s' % (RedisHashBackend.HISTORY_FIELD_PREFIX, path)
+
+	def get_redis(self):
+		from django_redis import get_redis_connection
+		return get_redis_connection('default')
+
+	@cached_property
+	def codec(self):
+		rv = super(RedisHashBackend, self).codec
+		if rv is None:
+			raise ImproperlyConfigured('%s requires USSD[\'SESSION_CODEC\'].' % self.__class__.__name__)
+		return rv
+
+	def get_session_cache_key(self, key):
+		return cache.make_key(super(RedisHashBackend, self).get_session_cache_key(key))
+
+	def get_saved_session(self, key, request):
+		fields = request._ussd_session_fields = self.get_redis().hgetall(self.get_session_cache_key(key))
+		data = fields.get(self.SESSION_FIELD)
+		return None if data is None else self.codec.loads(data)
+
+	def open_session(self, req):
+		session = super(RedisHashBackend, self).open_session(req)
+		session.history_store = HashHistoryStore(self.codec, req._ussd_session_fields)
+		return session
+
+	def save_session(self, session, request):
+		store = session.history_store
+		hkey = self.get_session_cache_key(session.key)
+		stack = session.history.stack
+		mapping = {self.SESSION_FIELD: self.codec.dumps(session)}
+		for path, ref in store.pending.items():
+			if path in stack:
+				mapping[self.history_field(path)] = self.codec.dumps_value(ref)
+
+		# refs of screens no longer on the stack, e.g. after a reset
+		stack = set(self.history_field(p).encode() for p in stack)
+		stale = [f for f in store.fields if f != self.SESSION_FIELD and f not in stack]
+
+		pipe = self.get_redis().pipeline()
+		if stale:
+			pipe.hdel(hkey, *stale)
+		pipe.hset(hkey, mapping=mapping)
+		pipe.expire(hkey, self.get_session_timeout())
+		pipe.execute()
+
+
 def _get_ussd_session_backend():
 	cls = ussd_settings.SESSION_BACKEND
 	return cls()
@@ -0,0 +1,51 @@
+"""A small runner for the USSD micro-benchmarks.
+
+Apps declare benchmarks in a `bench` module with the `@benchmark`
+decorator; `manage.py ussdbench` imports them and prints their results.
+A benchmark returns a list of result rows, one dict per measured variant.
+"""
+import time
+from importlib import import_module
+from django.apps import apps
+from django.utils.module_loading import module_has_submodule
+
+from .utils import ClassReigistry
+
+BENCH_MODULE_NAME = 'bench'
+
+_REGISTRY = ClassReigistry()
+
+
+def benchmark(func=None, name=None):
+	if func is None:
+		return lambda f: benchmark(f, name=name)
+	_REGISTRY[name or func.__name__] = func
+	return func
+
+
+def load_bench_modules():
+	for appconfig in apps.get_app_configs():
+		if module_has_submodule(appconfig.module, BENCH_MODULE_NAME):
+			import_module('%s.%s' % (appconfig.name, BENCH_MODULE_NAME))
+
+
+def get_benchmarks(*names):
+	load_bench_modules()
+	if not names:
+		return dict(_REGISTRY)
+	try:
+		return {n: _REGISTRY[n] for n in names}
+	except KeyError as e:
+		raise LookupError('Benchmark "%s" not found' % e.args[0])
+
+
+def measure(func, *args, number=1000, repeat=5):
+	"""Best time per call, in microseconds, over `repeat` runs of `number` calls."""
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		for _ in range(number):
+			func(*args)
+		elapsed = (time.perf_counter() - start) / number
+		best = elapsed if best is None else min(best, elapsed)
+	return round(best * 1e6, 2)
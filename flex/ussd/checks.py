@@ -0,0 +1,29 @@
+from django.core.checks import Warning, register
+
+from .settings import ussd_settings
+
+
+@register()
+def check_screen_uid_manifest(app_configs, **kwargs):
+	"""Warn about screens missing from the screen uid manifest.
+
+	Their uids are derived at import time, so two of them that collide may
+	get different uids in processes that import them in another order.
+	"""
+	from .screens.base import _REGISTRY, _load_uid_manifest
+
+	path = ussd_settings.SCREEN_UID_MANIFEST
+	if not path:
+		return []
+
+	manifest = _load_uid_manifest()
+	missing = sorted({cls._meta.name for cls in _REGISTRY.values()} - set(manifest))
+	if not missing:
+		return []
+	return [
+		Warning(
+			'%d UssdScreen(s) missing from the uid manifest: %s.' % (len(missing), ', '.join(missing)),
+			hint='Run `manage.py ussdscreens` to update %s.' % (path,),
+			id='flex_ussd.W001',
+		)
+	]
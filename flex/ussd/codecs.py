@@ -0,0 +1,175 @@
+"""Compact session serialization for the USSD session backends.
+
+`JsonSessionCodec` writes a session as versioned JSON. Model instances are
+stored as `(app_label.model_name, pk)` references and come back as
+`ModelRef`s that only query the database when first used, so a hop that
+never touches `state.product` never loads it. A `SlottedScreenState` is
+stored as its fields and rebuilt by its screen's name. Values the codec has no
+tag for fall back to pickle.
+"""
+import json
+import pickle
+import base64
+import datetime
+from decimal import Decimal
+from functools import lru_cache
+
+from django.apps import apps
+from django.db.models import Model
+from django.utils.functional import SimpleLazyObject, empty
+from django.utils.module_loading import import_string
+
+from .utils import AttributeBag, ArgumentVector
+from .screens.base import SlottedScreenState, restore_screen_state
+
+
+class ModelRef(SimpleLazyObject):
+	"""A model instance that is fetched on first access."""
+
+	def __init__(self, label, pk):
+		self.__dict__['_ref'] = (label, pk)
+		super(ModelRef, self).__init__(self._fetch)
+
+	def _fetch(self):
+		label, pk = self._ref
+		return apps.get_model(label)._base_manager.get(pk=pk)
+
+	@property
+	def pk(self):
+		#known without fetching the instance
+		return self._ref[1]
+
+	@property
+	def is_loaded(self):
+		return self._wrapped is not empty
+
+	def __reduce__(self):
+		return (type(self), self._ref)
+
+	def __repr__(self):
+		if self.is_loaded:
+			return super(ModelRef, self).__repr__()
+		return '<%s: %s#%s>' % (type(self).__name__, *self._ref)
+
+
+def _qualname(cls):
+	return '%s.%s' % (cls.__module__, cls.__qualname__)
+
+
+_import_class = lru_cache(maxsize=None)(import_string)
+
+
+class JsonSessionCodec(object):
+	"""Tagged values are JSON objects carrying their tag under the "~" key,
+	e.g. `{"~": "m", "v": ["products.product", 3]}` for a model instance. A
+	plain dict is only wrapped when it has a "~" key of its own.
+	"""
+
+	VERSION = 1
+
+	TAG = '~'
+
+	def __init__(self, session_class):
+		self.session_class = session_class
+		self.encoders = {
+			list: lambda o: [self.encode(v) for v in o],
+			dict: self.encode_dict,
+			tuple: lambda o: self.tagged('t', [self.encode(v) for v in o]),
+			ArgumentVector: lambda o: self.tagged('av', list(o)),
+			ModelRef: lambda o: self.tagged('m', list(o._ref)),
+			Decimal: lambda o: self.tagged('dec', str(o)),
+			datetime.datetime: lambda o: self.tagged('dt', o.isoformat()),
+			datetime.date: lambda o: self.tagged('da', o.isoformat()),
+		}
+		self.decoders = {
+			'd': lambda v: {k: self.decode(x) for k, x in v.items()},
+			't': lambda v: tuple(self.decode(x) for x in v),
+			'av': self.decode_argv,
+			'm': lambda v: ModelRef(*v),
+			'ss': lambda v: restore_screen_state(self.decode(v)),
+			'nt': lambda v, c: _import_class(c)(*self.decode(v)),
+			'b': lambda v, c: self._restore(_import_class(c), self.decode(v)),
+			's': lambda v, c: _import_class(c)(v),
+			'dec': Decimal,
+			'dt': datetime.datetime.fromisoformat,
+			'da': datetime.date.fromisoformat,
+			'p': lambda v: pickle.loads(base64.b64decode(v)),
+		}
+
+	def tagged(self, tag, value, cls=None):
+		rv = {self.TAG: tag, 'v': value}
+		if cls is not None:
+			rv['c'] = _qualname(cls)
+		return rv
+
+	def encode(self, obj):
+		#dispatched on type() first: isinstance() on a ModelRef would load it
+		t = type(obj)
+		if obj is None or t is str or t is int or t is bool or t is float:
+			return obj
+		encoder = self.encoders.get(t)
+		if encoder is not None:
+			return encoder(obj)
+		if isinstance(obj, Model):
+			return self.tagged('m', [obj._meta.label_lower, obj.pk])
+		if isinstance(obj, tuple) and hasattr(obj, '_fields'):
+			return self.tagged('nt', [self.encode(v) for v in obj], t)
+		if isinstance(obj, SlottedScreenState):
+			return self.tagged('ss', self.encode(obj.todict()))
+		if isinstance(obj, AttributeBag):
+			state = obj.__getstate__()
+			if not state.get('_bases'):
+				state.pop('_bases', None)
+			return self.tagged('b', self.encode(state), t)
+		if isinstance(obj, str):
+			return self.tagged('s', str(obj), t)
+		return self.tagged('p', base64.b64encode(pickle.dumps(obj, -1)).decode('ascii'))
+
+	def encode_dict(self, obj):
+		rv = {}
+		for k, v in obj.items():
+			if type(k) is not str:
+				return self.tagged('p', base64.b64encode(pickle.dumps(obj, -1)).decode('ascii'))
+			rv[k] = self.encode(v)
+		return self.tagged('d', rv) if self.TAG in rv else rv
+
+	def decode(self, obj):
+		t = type(obj)
+		if t is list:
+			return [self.decode(v) for v in obj]
+		if t is not dict:
+			return obj
+		tag = obj.get(self.TAG)
+		if tag is None:
+			return {k: self.decode(v) for k, v in obj.items()}
+		if 'c' in obj:
+			return self.decoders[tag](obj['v'], obj['c'])
+		return self.decoders[tag](obj['v'])
+
+	def decode_argv(self, value):
+		rv = ArgumentVector()
+		rv.extend(value)
+		return rv
+
+	def _restore(self, cls, state):
+		#the same as unpickling an object without __setstate__
+		rv = cls.__new__(cls)
+		rv.__dict__.update(state)
+		return rv
+
+	def dumps(self, session):
+		data = dict(v=self.VERSION, s=self.encode(session.__getstate__()))
+		return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+	def dumps_value(self, value):
+		return json.dumps(self.encode(value), separators=(',', ':')).encode('utf-8')
+
+	def loads_value(self, data):
+		return self.decode(json.loads(data))
+
+	def loads(self, data):
+		"""Returns the session, or None for data written by another version."""
+		data = json.loads(data)
+		if data.get('v') != self.VERSION:
+			return None
+		return self._restore(self.session_class, self.decode(data['s']))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from flex.ussd.bench import get_benchmarks
+
+
+class Command(BaseCommand):
+	help = 'Runs the USSD micro-benchmarks declared in the apps\' bench modules.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('names', nargs='*', help='Benchmarks to run. Defaults to all.')
+		parser.add_argument('--number', type=int, default=1000, help='Calls per timing run.')
+
+	def handle(self, *args, **options):
+		try:
+			benchmarks = get_benchmarks(*options['names'])
+		except LookupError as e:
+			raise CommandError(str(e))
+
+		for name, func in benchmarks.items():
+			self.stdout.write(self.style.MIGRATE_HEADING(name))
+			rows = func(number=options['number'])
+			columns = list(dict.fromkeys(k for row in rows for k in row))
+			widths = [max(len(str(c)), *(len(str(r.get(c, ''))) for r in rows)) for c in columns]
+			self.stdout.write('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+			for row in rows:
+				self.stdout.write('  '.join(str(row.get(c, '')).ljust(w) for c, w in zip(columns, widths)))
+			self.stdout.write('')
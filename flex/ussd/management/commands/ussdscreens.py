@@ -0,0 +1,64 @@
+import os
+import json
+import pickle
+
+from django.core.management.base import BaseCommand, CommandError
+
+from flex.ussd.settings import ussd_settings
+from flex.ussd.screens.base import _REGISTRY, make_screen_uid
+
+
+class Command(BaseCommand):
+	help = 'Writes the screen uid manifest (USSD.SCREEN_UID_MANIFEST) for the registered screens.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--check', action='store_true',
+			help='Exit with an error if the manifest is out of date, without writing it.')
+		parser.add_argument('--legacy-map',
+			help='Keep the uids of an old pickled .ussd-screens-uid.map file.')
+
+	def load(self, path):
+		if not os.path.exists(path):
+			return {}
+		with open(path, 'r') as fo:
+			return json.load(fo)
+
+	def load_legacy(self, path):
+		with open(path, 'rb') as fo:
+			return dict(pickle.load(fo))
+
+	def build(self, current, legacy):
+		names = sorted({cls._meta.name for cls in _REGISTRY.values()})
+		rv, taken = {}, set()
+		#uids already handed out stay put, or live sessions would point to
+		#the wrong screens.
+		for source in (current, legacy):
+			for name in names:
+				uid = source.get(name)
+				if name not in rv and uid and uid not in taken:
+					rv[name] = uid
+					taken.add(uid)
+		for name in names:
+			if name not in rv:
+				rv[name] = make_screen_uid(name, taken)
+				taken.add(rv[name])
+		return rv
+
+	def handle(self, *args, **options):
+		path = ussd_settings.SCREEN_UID_MANIFEST
+		if not path:
+			raise CommandError('The USSD.SCREEN_UID_MANIFEST setting is not set.')
+
+		current = self.load(path)
+		legacy = self.load_legacy(options['legacy_map']) if options['legacy_map'] else {}
+		manifest = self.build(current, legacy)
+
+		if options['check']:
+			if manifest != current:
+				raise CommandError('%s is out of date. Run `manage.py ussdscreens`.' % path)
+			return
+
+		with open(path, 'w') as fo:
+			json.dump(manifest, fo, indent=1, sort_keys=True)
+			fo.write('\n')
+		self.stdout.write('Wrote %d screen uids to %s' % (len(manifest), path))
@@ -1,11 +1,17 @@
 import re
+from urllib.parse import parse_qs
 
 from .backends import ussd_session_backend
 from .settings import ussd_settings
-from .utils import ArgumentVector
+from .tracing import tracer
+from .utils import parse_argv, split_argstr, resolve_nav
 
 
 class UssdMiddleware(object):
+	"""Opens the USSD session of a request and saves it once the view
+	returns. Subclasses may define `teardown_request(req, res)` to post-process
+	the response after the session is saved.
+	"""
 
 	def __init__(self, get_response):
 		self.get_response = get_response
@@ -54,16 +60,16 @@ class UssdMiddleware(object):
 		base_code = request.GET.get('initial_code')
 		argstr = request.GET['ussd_string']
 
-		argv = ArgumentVector(service_code, argstr, base_code)
 		request.service_code = service_code
 
 		session = request.ussd_session
 		xargv = session.argv
 
-		request.args = argv - xargv if xargv else []
+		argv, request.args = parse_argv(service_code, argstr, base_code, xargv, session.argstr)
 
 		#TODO:- argv might not be needed in the request object. DONE.
 		session.argv = argv
+		session.argstr = argstr
 
 		# print(' Ussd argv  	: %r' % (argv,))
 		# print(' Ussd xargv 	: %r' % (xargv,))
@@ -72,7 +78,9 @@ class UssdMiddleware(object):
 	def __call__(self, req):
 		
 		is_ussd_request = self.is_ussd_request(req)
+		trace = None
 		if is_ussd_request:
+			trace = tracer.start(req)
 			self.open_session(req)
 			self.prepare_request(req)
 
@@ -80,8 +88,70 @@ class UssdMiddleware(object):
 
 		if is_ussd_request:
 			self.close_session(req, response)
+			if trace is not None:
+				trace.finish(req, response)
+			teardown = getattr(self, 'teardown_request', None)
+			if teardown is not None:
+				response = teardown(req, response)
 
+		return response
+
+
+
+class AsyncUssdMiddleware(UssdMiddleware):
+	"""UssdMiddleware for async views, e.g. `AsyncUssdView`.
+
+	The session is opened and saved through the backend's async methods and
+	`ateardown_request`, the coroutine counterpart of `teardown_request`, is
+	awaited once the session is saved.
+	"""
+
+	async def aopen_session(self, req):
+		req.ussd_session = await self.backend.aopen_session(req)
+
+	async def aclose_session(self, req, response):
+		if hasattr(req, 'ussd_session'):
+			await self.backend.aclose_session(req.ussd_session, req, response)
+
+	async def __call__(self, req):
+		is_ussd_request = self.is_ussd_request(req)
+		trace = None
+		if is_ussd_request:
+			trace = tracer.start(req)
+			await self.aopen_session(req)
+			self.prepare_request(req)
+
+		response = await self.get_response(req)
+
+		if is_ussd_request:
+			await self.aclose_session(req, response)
+			if trace is not None:
+				trace.finish(req, response)
+			teardown = getattr(self, 'ateardown_request', None)
+			if teardown is not None:
+				response = await teardown(req, response)
 
 		return response
 
 
+class MenuStringMiddleware(object):
+	"""Routes gateway requests that send the whole menu path in a
+	`menu_string` query param, e.g. `/ussd/?menu_string=1*2*98*3`, to
+	`/u/<path>`, with the "back" (0), "home" (99) and "more" (98) inputs
+	applied to the path.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		if request.path_info.startswith('/ussd/'):
+			menu_string = parse_qs(request.META.get('QUERY_STRING', '')).get('menu_string')
+			path = process_menu_string(menu_string[0]) if menu_string else ''
+			request.path = '%s/u/%s' % (request.META.get('SCRIPT_NAME', '').rstrip('/'), path)
+			request.path_info = '/u/%s' % path
+		return self.get_response(request)
+
+
+def process_menu_string(menu_string):
+	return '*'.join(resolve_nav(split_argstr(menu_string)))
@@ -1,3 +1,3 @@
-from .base import UssdScreenType, UssdScreen, UssdPayload, ScreenState, ScreenRef
+from .base import UssdScreenType, UssdScreen, UssdPayload, ScreenState, SlottedScreenState, ScreenRef
 from .base import get_screen, get_screen_uid, get_home_screen, render_screen
 from .base import END, CON
@@ -1,13 +1,13 @@
 import os
-import re
 import string
-import random
-import pickle
+import json
+import hashlib
 import warnings
+import zlib
 from django.apps import apps
 from collections import namedtuple
-from django.conf import settings
 from django.core.cache import cache
+from django.db.models import Model
 from collections import OrderedDict
 from logging import getLogger
 
@@ -27,38 +27,53 @@ _REGISTRY = ClassReigistry()
 _UID_LEN = ussd_settings.SCREEN_UID_LEN
 
 
-_UID_LOCK = set()
-_UID_LOCK_FILE = os.path.join(settings.LOCAL_DATA_DIR, '.ussd-screens-uid.lock')
-if os.path.exists(_UID_LOCK_FILE):
-	with open(_UID_LOCK_FILE, 'r') as fo:
-		_UID_LOCK = set((k.strip() for k in fo.read().split('\n') if k.strip()))
+def _load_uid_manifest():
+	path = ussd_settings.SCREEN_UID_MANIFEST
+	if path and os.path.exists(path):
+		with open(path, 'r') as fo:
+			return ClassReigistry(json.load(fo))
+	return ClassReigistry()
 
 
-def _save_uid_lock():
-	with open(_UID_LOCK_FILE, 'w+') as fo:
-		fo.write('\n'.join(_UID_LOCK))
+#name -> uid, as generated by the `ussdscreens` command. Read once, never written.
+_UID_MAP = _load_uid_manifest()
 
+_UIDS = set(_UID_MAP.values())
 
-_UID_MAP =  ClassReigistry()
-_UID_MAP_FILE = os.path.join(settings.LOCAL_DATA_DIR, '.ussd-screens-uid.map')
-if os.path.exists(_UID_MAP_FILE):
-	with open(_UID_MAP_FILE, 'rb') as mp:
-		_UID_MAP = pickle.load(mp)
+_UID_CHARS = string.digits + string.ascii_lowercase
 
 
-def _save_uid_map():
-	with open(_UID_MAP_FILE, 'wb+') as fo:
-		pickle.dump(_UID_MAP, fo)
+def make_screen_uid(name, taken=(), length=_UID_LEN):
+	"""Derive a uid from the screen's name.
 
+	The same name always gives the same uid, so every process agrees on it
+	without sharing any state. On a collision the name is rehashed with a
+	counter until a free uid comes up.
+	"""
+	attempt = 0
+	while True:
+		key = name if attempt == 0 else '%s:%d' % (name, attempt)
+		n = int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'big')
+		rv = ''.join(_UID_CHARS[(n // len(_UID_CHARS)**i) % len(_UID_CHARS)] for i in range(length))
+		if rv not in taken:
+			return rv
+		attempt += 1
 
-def _generate_screen_uid():
-	rv = None
-	while rv is None or rv in _UID_LOCK or rv in _REGISTRY:
-		rv = ''.join(random.choice(string.digits + string.ascii_lowercase)\
-				for _ in range(2))
-	_UID_LOCK.add(rv)
-	_save_uid_lock()
-	return rv
+
+def _get_screen_uid(name):
+	uid = _UID_MAP.get(name)
+	if not uid:
+		#not in the manifest yet: hashed against every uid the manifest
+		#reserves, so it never takes a manifested screen's uid. A collision
+		#between two unmanifested screens goes to the one imported first, so
+		#`manage.py check` warns about them (see checks.py).
+		uid = make_screen_uid(name, _UIDS)
+		_UID_MAP[name] = uid
+		if ussd_settings.SCREEN_UID_MANIFEST:
+			logger.warning('UssdScreen "%s" is missing from the uid manifest. '
+				'Run `manage.py ussdscreens` to update it.' % name)
+	_UIDS.add(uid)
+	return uid
 
 
 
@@ -93,7 +108,7 @@ def get_screen(screen, default=NOTHING):
 def get_screen_uid(screen, default=NOTHING):
 	scls = get_screen(screen)
 	rv = scls.__uid__
-	assert rv in _UID_LOCK, ('Screen UID "%s" not registered' % (rv,))
+	assert _REGISTRY.get(rv) is scls, ('Screen UID "%s" not registered' % (rv,))
 	return rv
 
 
@@ -113,6 +128,185 @@ class ScreenState(AttributeBag):
 		return super(ScreenState, self).reset('screen', *keep, **values)
 
 
+#kept by UssdScreen.dispatch in the state of every screen
+SCREEN_STATE_FIELDS = ('screen', '_action', '_current_page', '_pages', '_body')
+
+
+class SlottedScreenState(object):
+	"""The state of a screen that lists its fields in `Meta.state`.
+
+	Fields are slots, so reading one is a plain attribute lookup and setting
+	a field the screen doesn't list raises AttributeError. A field that
+	hasn't been set raises AttributeError too, the same as on a ScreenState,
+	so `get()` defaults still apply. Pickled as the screen's uid and a tuple
+	of the field values, with model instances as `ModelRef`s; encoded by the
+	json codec as the fields that are set.
+	"""
+
+	__slots__ = ()
+
+	_fields = ()
+
+	def __init__(self, screen, **data):
+		self.screen = screen
+		for k, v in data.items():
+			setattr(self, k, v)
+
+	def get(self, name, default=None):
+		return getattr(self, name, default)
+
+	def pop(self, name, default=NOTHING):
+		try:
+			rv = getattr(self, name)
+		except AttributeError:
+			if default is NOTHING:
+				raise KeyError(name)
+			return default
+		delattr(self, name)
+		return rv
+
+	def setdefault(self, name, default=None):
+		try:
+			return getattr(self, name)
+		except AttributeError:
+			setattr(self, name, default)
+			return default
+
+	def update(self, *args, **kwargs):
+		for k, v in dict(*args, **kwargs).items():
+			setattr(self, k, v)
+
+	def getitems(self):
+		rv = []
+		for k in self._fields:
+			v = getattr(self, k, NOTHING)
+			if v is not NOTHING:
+				rv.append((k, v))
+		return rv
+
+	def getkeys(self):
+		return [k for k, v in self.getitems()]
+
+	def getvalues(self):
+		return [v for k, v in self.getitems()]
+
+	def todict(self):
+		return dict(self.getitems())
+
+	def copy(self, **new_values):
+		rv = type(self)(**self.todict())
+		if new_values:
+			rv.update(new_values)
+		return rv
+
+	def clear(self):
+		for k in self.getkeys():
+			delattr(self, k)
+
+	def reset(self, *keep, **values):
+		for k in ('screen',) + keep:
+			if k in self:
+				values.setdefault(k, getattr(self, k))
+		self.clear()
+		self.update(values)
+
+	def __contains__(self, item):
+		return item in self._fields and hasattr(self, item)
+
+	def __iter__(self):
+		return iter(self.getitems())
+
+	def __getitem__(self, key):
+		try:
+			return getattr(self, key)
+		except AttributeError:
+			raise KeyError(key)
+
+	def __setitem__(self, key, value):
+		setattr(self, key, value)
+
+	def __delitem__(self, key):
+		try:
+			delattr(self, key)
+		except AttributeError:
+			raise KeyError(key)
+
+	def __reduce__(self):
+		#the screen's uid, a bit per field that is set and their values, in
+		#field order. model instances go in as refs, as the json codec stores them.
+		ref = _get_model_ref_class()
+		mask, values = 0, []
+		for i, k in enumerate(self._fields[1:]):
+			v = getattr(self, k, NOTHING)
+			if v is NOTHING:
+				continue
+			t = type(v)
+			#type() and not isinstance(), which would load a ModelRef
+			if t not in _PLAIN_TYPES and t is not ref and issubclass(t, Model):
+				v = ref(v._meta.label_lower, v.pk)
+			mask |= 1 << i
+			values.append(v)
+		return (_unpickle_screen_state, (self._screen_uid, self._fields_crc, mask, tuple(values)))
+
+	def __str__(self):
+		return '%s' % self.todict()
+
+	def __repr__(self):
+		return '<%s: %s>' % (self.__class__.__name__, self)
+
+
+_model_ref_class = None
+
+def _get_model_ref_class():
+	#imported late, the codecs module imports this one
+	global _model_ref_class
+	if _model_ref_class is None:
+		from ..codecs import ModelRef
+		_model_ref_class = ModelRef
+	return _model_ref_class
+
+
+#values that are never model instances
+_PLAIN_TYPES = frozenset((str, int, float, bool, type(None), list, tuple, dict, OrderedDict))
+
+
+def make_state_class(screen, fields):
+	fields = tuple(OrderedDict.fromkeys(SCREEN_STATE_FIELDS + tuple(fields)))
+	return type('%sState' % screen.__name__, (SlottedScreenState,),
+		dict(__slots__=fields, _fields=fields, __module__=screen.__module__,
+			_screen_uid=screen.__uid__, _fields_crc=zlib.crc32(' '.join(fields).encode())))
+
+
+def _unpickle_screen_state(uid, crc, mask, values):
+	screen = get_screen(uid)
+	cls = screen.state_class
+	rv = cls.__new__(cls)
+	rv.screen = screen._meta.name
+	if getattr(cls, '_fields_crc', None) != crc:
+		#pickled before the screen's Meta.state changed
+		logger.warning('Discarding the state of UssdScreen "%s". Its fields have changed.' % rv.screen)
+		return rv
+	values = iter(values)
+	for i, k in enumerate(cls._fields[1:]):
+		if mask >> i & 1:
+			setattr(rv, k, next(values))
+	return rv
+
+
+def restore_screen_state(data):
+	"""Rebuild a pickled or encoded SlottedScreenState with its screen's
+	current state class, dropping fields the screen no longer lists."""
+	cls = get_screen(data['screen']).state_class
+	if not issubclass(cls, SlottedScreenState):
+		return cls(**data)
+	rv = cls.__new__(cls)
+	for k in cls._fields:
+		v = data.get(k, NOTHING)
+		if v is not NOTHING:
+			setattr(rv, k, v)
+	return rv
+
+
 class UssdScreenType(type):
 
 	def __new__(mcls, name, bases, dct):
@@ -131,13 +325,13 @@ class UssdScreenType(type):
 			if cls._meta.name in _REGISTRY:
 				raise RuntimeError('UssdScreen name conflict. %s' % cls._meta.name)
 			_REGISTRY[cls._meta.name] = cls
-			uid = _UID_MAP.get(cls._meta.name)
-			if not uid:
-				uid = _generate_screen_uid()
-				_UID_MAP[cls._meta.name] = uid
-				_save_uid_map()
+			uid = _get_screen_uid(cls._meta.name)
+			if _REGISTRY.get(uid, cls) is not cls:
+				raise RuntimeError('UssdScreen uid conflict. %s: %s' % (cls._meta.name, uid))
 			cls.__uid__ = uid
 			_REGISTRY[uid] = cls
+			if cls._meta.state_fields is not None:
+				cls.state_class = make_state_class(cls, cls._meta.state_fields)
 
 		return cls
 
@@ -174,61 +368,87 @@ class UssdScreenType(type):
 
 class UssdPayload(object):
 
-	# __slots__ = '_body', '_header', '_footer', 'offset', 'max_len',
+	__slots__ = 'chunks',
 
 	def __init__(self):
-		self.body = ''
+		self.chunks = []
 
 	def append(self, *objs, sep=' ', end='\n'):
-		# self.chunks.append('%s%s' % (sep.join((str(s) for s in objs)), end))
-		self.body += '%s%s' % (sep.join((str(s) for s in objs)), end)
+		self.chunks.append('%s%s' % (sep.join((str(s) for s in objs)), end))
 
-	def paginate(self, page_size, next_page_choice, prev_page_choice, foot=''):
-		if isinstance(foot, (list, tuple)):
-			foot_list = foot[:1]+[str(next_page_choice),]+foot[1:]
-			foot = '\n'.join(foot)
-		else:
-			foot_list = None
+	@property
+	def body(self):
+		return ''.join(self.chunks)
 
-		foot = foot and '\n%s' % foot
-		lfoot = len(foot)
-		if len(self.body.strip()) + lfoot <= page_size:
-			yield self.body.strip()+foot
-		else:
-			lnext, lprev = len(str(next_page_choice)) + len('\n'), len(str(prev_page_choice))
-			lnav = lnext + lprev
-			chunk, i = self.body.strip(), 0
-			while chunk:
-				lc = len(chunk)
-				if i > 0 and lc <= lprev + page_size:
-					yield '%s\n%s' % (chunk, prev_page_choice)
-					chunk = None
-				else:
-					yv = re.sub(r'([\n]+[^\n]+[\n]*)$', '', chunk[:(page_size-lnav if i > 0 else page_size-lfoot-lnext)]).strip()
-					if i > 0:
-						yield '%s\n%s\n%s' % (yv, prev_page_choice, next_page_choice)
-					else:
-						if foot_list:
-							yield '%s\n%s' % (yv, '\n'.join(foot_list))
-						else:
-							yield '%s%s\n%s' % (yv, foot, next_page_choice)
-
-					chunk = chunk[len(yv)+1:].strip()
-				i += 1
+	def paginate(self, page_size, next_page_choice, prev_page_choice, foot=''):
+		return UssdPaginator(str(self), page_size, next_page_choice, prev_page_choice, foot)
 
 	def __len__(self):
 		return len(str(self))
 
 	def __str__(self):
-		# return ''.join(self.chunks).strip()
 		return self.body.strip()
 
-	# def __getstate__(self):
-	# 	return self.chunks, None
 
-	# def __setstate__(self, state):
-	# 	self.chunks, self.prev = state
 
+class UssdPaginator(object):
+	"""Splits a payload into pages on line boundaries.
+
+	Pages are found as they are asked for. `offsets` holds the start of
+	every page found so far and is all that needs to be kept to render them
+	again from the same text. A line too long for a page is cut where the
+	page ends.
+	"""
+
+	__slots__ = 'text', 'page_size', 'next', 'prev', 'foot', 'offsets'
+
+	def __init__(self, text, page_size, next_page_choice, prev_page_choice, foot='', offsets=None):
+		if isinstance(foot, (list, tuple)):
+			foot = [str(f) for f in foot]
+		else:
+			foot = [str(foot)] if foot else []
+		self.text = text
+		self.page_size = page_size
+		self.next = str(next_page_choice)
+		self.prev = str(prev_page_choice)
+		self.foot = foot
+		self.offsets = list(offsets or (0,))
+
+	def get_footer(self, i, last):
+		if i == 0:
+			return self.foot if last else self.foot[:1] + [self.next] + self.foot[1:]
+		return [self.prev] if last else [self.prev, self.next]
+
+	def get_budget(self, i, last):
+		footer = self.get_footer(i, last)
+		return self.page_size - sum(len(f) + 1 for f in footer)
+
+	def get_end(self, i):
+		start, size = self.offsets[i], len(self.text)
+		if size - start <= self.get_budget(i, True):
+			return size
+		limit = start + self.get_budget(i, False)
+		end = self.text.rfind('\n', start, limit + 1)
+		return end if end > start else limit
+
+	def page(self, i):
+		"""Render page `i`. Its offset must have been found by rendering page `i-1`."""
+		end = self.get_end(i)
+		last = end >= len(self.text)
+		if not last and i + 1 == len(self.offsets):
+			start = end
+			while start < len(self.text) and self.text[start].isspace():
+				start += 1
+			self.offsets.append(start)
+		return '\n'.join([self.text[self.offsets[i]:end].strip(), *self.get_footer(i, last)])
+
+	def __iter__(self):
+		i = 0
+		while True:
+			yield self.page(i)
+			i += 1
+			if i == len(self.offsets):
+				return
 
 
 
@@ -330,7 +550,7 @@ class UssdScreen(object, metaclass=UssdScreenType):
 
 		pg_menu = self.PAGINATION_MENU
 
-		rv, pages, i = None, self.state.get('_pages', []), 0
+		rv, pages, i = None, self.state.get('_pages') or [0], 0
 		if args and args[0] in (pg_menu.next.value, pg_menu.prev.value) and len(pages) > 1:
 			if args[0] == pg_menu.prev.value and self.state.get('_current_page', 0) > 0:
 				self.state._current_page = i = self.state._current_page - 1
@@ -350,22 +570,36 @@ class UssdScreen(object, metaclass=UssdScreenType):
 			# rv = self.restore(*(args or ())) if restore else self.render(*(args or ()))
 			if rv == self.CON or rv == self.END:
 				self.state._action = rv
-				self.state._pages = pages = list(
-						self.payload.paginate(
-								ussd_settings.MAX_PAGE_LENGTH-4,
-								pg_menu.next, pg_menu.prev,
-								self.get_nav_menu_list()
-							)
-						)
 				self.state._current_page = i = 0
+				paginator = self.paginate(str(self.payload))
+				page = paginator.page(i)
+				#paging through the text doesn't render the screen again:
+				#render() handles the input it is given, so it may move to
+				#another screen, change the state or hit the database. The
+				#text is kept instead, only while it has more than one page.
+				#That costs its length, i.e. less than MAX_PAGE_LENGTH per
+				#page, in the session for as long as the state is in it.
+				self.state._body = paginator.text if len(paginator.offsets) > 1 else None
+				self.state._pages = paginator.offsets
 				# self.state._prev = self.payload
 			else:
 				return rv
+		else:
+			paginator = self.paginate(self.state._body, pages)
+			page = paginator.page(i)
+			self.state._pages = paginator.offsets
 
-		return '%s %s' % (rv, pages[i])
+		return '%s %s' % (rv, page)
 		# return '%s\n%s\n%s\n%s\n - Payload: %s\n - Page: %s\n - Response: %s'\
 		# 	% (rv, '-'*40, self.state._prev, '-'*40, len(self.state._prev), len(pages[i]), len(rv))
 
+	def paginate(self, text, offsets=None):
+		return UssdPaginator(text,
+				ussd_settings.MAX_PAGE_LENGTH-4,
+				self.PAGINATION_MENU.next, self.PAGINATION_MENU.prev,
+				self.get_nav_menu_list(), offsets
+			)
+
 	def render(self, *args):
 		raise NotImplementedError('render method for screen %s' \
 			% self.__class__.__name__)
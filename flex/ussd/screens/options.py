@@ -159,6 +159,13 @@ class ScreenMetaOptions(BaseScreenMetaOptions):
 	def next_screens(self, value):
 		return []
 
+	@screen_meta_option('state')
+	def state_fields(self, value, base):
+		#the fields a SlottedScreenState keeps for the screen, added to the base's
+		if value is None:
+			return base
+		return tuple(base or ()) + tuple(value)
+
 	@screen_meta_option(inherit=False)
 	def label(self, value):
 		value = value or _class_name_to_snake(self.screen.__name__)
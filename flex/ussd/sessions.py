@@ -33,6 +33,8 @@ class UssdSessionKey(namedtuple('_UssdSessionKey', 'uid sid')):
 
 class UssdSession(object):
 	restored = None
+	history_store = None
+	argstr = None
 
 	def __init__(self, key):
 		self.key = key
@@ -41,6 +43,7 @@ class UssdSession(object):
 		self.data = AttributeBag()
 		self.ctx = AttributeBag()
 		self.argv = None
+		self.argstr = None
 		self._is_started = False
 		self._history_stack = None
 		self._history = None
@@ -53,7 +56,7 @@ class UssdSession(object):
 	@property
 	def history(self):
 		if self._history is None:
-			self._history = History(self._history_stack, self.msisdn)
+			self._history = History(self._history_stack, self.msisdn, self.history_store)
 		return self._history
 
 	@property
@@ -100,7 +103,7 @@ class UssdSession(object):
 	def __getstate__(self):
 		state = self.__dict__.copy()
 		state['_history_stack'] = self.history.stack
-		for k in ('_is_started', 'request', '_history'):
+		for k in ('_is_started', 'request', '_history', 'history_store'):
 			if k in state:
 				del state[k]
 		state['_history'] = None
@@ -130,24 +133,41 @@ class HistoryPath(str):
 
 
 
-class History(object):
+class CacheHistoryStore(object):
+	"""Keeps the screen refs of a session's history as separate cache entries."""
 
-	__slots__ = ('stack', 'key')
+	__slots__ = ('key',)
 
-	def __init__(self, stack, key):
-		self.stack = stack or []
+	def __init__(self, key):
 		self.key = key
 
-	@property
-	def top(self):
-		return
-
 	def cache_key(self, path):
 		return '%s:%s' % (self.key, path)
 
 	def cache_timeout(self):
 		return ussd_settings.HISTORY_STATE_X * ussd_settings.SESSION_TIMEOUT
 
+	def get(self, path):
+		return cache.get(self.cache_key(path))
+
+	def set(self, path, ref):
+		cache.set(self.cache_key(path), ref, self.cache_timeout())
+
+
+
+class History(object):
+
+	__slots__ = ('stack', 'key', 'store')
+
+	def __init__(self, stack, key, store=None):
+		self.stack = stack or []
+		self.key = key
+		self.store = store or CacheHistoryStore(key)
+
+	@property
+	def top(self):
+		return
+
 	def pop(self, k=None):
 		k = k or 1
 		if self.stack and isinstance(k, int):
@@ -155,7 +175,7 @@ class History(object):
 			self.stack[k:] = []
 			path = self.stack and self.stack[-1] or None
 			if path:
-				ref = cache.get(self.cache_key(path))
+				ref = self.store.get(path)
 				if ref is not None:
 					return ScreenRef(path.head, *ref)
 
@@ -164,7 +184,7 @@ class History(object):
 		if not self.stack or self.stack[-1].head != uid:
 			path = HistoryPath('%s/%s' % (self.stack and self.stack[-1] or '', uid))
 			self.stack.append(path)
-			cache.set(self.cache_key(path), screen_ref[1:], self.cache_timeout())
+			self.store.set(path, screen_ref[1:])
 
 
 
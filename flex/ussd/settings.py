@@ -23,6 +23,7 @@ DEFAULTS = dict(
 	SESSION_BACKEND = 'flex.ussd.backends.CacheBackend',
 	SESSION_CLASS = 'flex.ussd.sessions.UssdSession',
 	SESSION_KEY_CLASS = 'flex.ussd.sessions.UssdSessionKey',
+	SESSION_CODEC = 'flex.ussd.codecs.JsonSessionCodec',
 	SESSION_KEY_PREFIX = 'ussd_session',
 	SESSION_TIMEOUT = 120,
 	URLS = (),
@@ -31,7 +32,11 @@ DEFAULTS = dict(
 	SCREEN_STATE_TIMEOUT = 120,
 	MAX_PAGE_LENGTH=182,
 	SCREEN_UID_LEN=2,
-	HISTORY_STATE_X = 16
+	SCREEN_UID_MANIFEST=None,
+	HISTORY_STATE_X = 16,
+	TRACE_MSISDNS = (),
+	TRACE_SAMPLE_RATE = 0,
+	TRACE_BUFFER_SIZE = 100,
 )
 
 
@@ -40,17 +45,20 @@ IMPORT_STRINGS = (
 	'SESSION_BACKEND',
 	'SESSION_CLASS',
 	'SESSION_KEY_CLASS',
+	'SESSION_CODEC',
 )
 
 
 VALUE_PARSERS = dict(
 	URLS = lambda v: normalize_urls(v),
-	DEFAULT_HTTP_METHODS = lambda v: ensure_list(v, str_split=True)
+	DEFAULT_HTTP_METHODS = lambda v: ensure_list(v, str_split=True),
+	TRACE_MSISDNS = lambda v: ensure_list(v, str_split=True),
 )
 
 
 VALUE_CHECKS = dict(
 	INITIAL_SCREEN = lambda v: v is not None,
+	TRACE_SAMPLE_RATE = lambda v: 0 <= v <= 1,
 )
 
 
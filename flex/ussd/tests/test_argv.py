@@ -0,0 +1,45 @@
+from django.test import SimpleTestCase
+
+from flex.ussd.utils import ArgumentVector, parse_argv
+
+
+class ParseArgvTests(SimpleTestCase):
+
+	service_code = '*483'
+
+	def replay(self, inputs, base_code=None, prefix=''):
+		"""Parse the argstr of every hop of a session both ways."""
+		xargv = xargstr = None
+		for i in range(len(inputs) + 1):
+			argstr = prefix + '*'.join(inputs[:i])
+			argv, new = parse_argv(self.service_code, argstr, base_code, xargv, xargstr)
+			full = ArgumentVector(self.service_code, argstr, base_code)
+			self.assertIsInstance(argv, ArgumentVector)
+			self.assertEqual(argv, full, argstr)
+			self.assertEqual(new, full - xargv if xargv else [], argstr)
+			xargv, xargstr = argv, argstr
+
+	def test_incremental_parsing_matches_the_full_parse(self):
+		self.replay(['1', '2', '98', '98', '0', '3', '1000', '0', '2000', '1'])
+
+	def test_quoted_inputs(self):
+		self.replay(['1', '"Jane Doe"', '"a*b"', '2'])
+
+	def test_a_base_code(self):
+		self.replay(['1', '2', '3'], base_code='7', prefix='7*')
+
+	def test_the_first_hop_has_no_new_inputs(self):
+		argv, new = parse_argv(self.service_code, '')
+		self.assertEqual(argv, ['*483'])
+		self.assertEqual(new, [])
+
+	def test_a_rewritten_history_is_parsed_in_full(self):
+		xargv = ArgumentVector(self.service_code, '1*2*3')
+		argv, new = parse_argv(self.service_code, '1*5*3*4', None, xargv, '1*2*3')
+		self.assertEqual(argv, ['*483', '1', '5', '3', '4'])
+		self.assertEqual(new, ['5', '3', '4'])
+
+	def test_an_open_quote_is_parsed_in_full(self):
+		xargv = ArgumentVector(self.service_code, '1*"a')
+		argv, _ = parse_argv(self.service_code, '1*"a*b"', None, xargv, '1*"a')
+		self.assertEqual(argv, ArgumentVector(self.service_code, '1*"a*b"'))
@@ -0,0 +1,63 @@
+from django.test import SimpleTestCase
+
+from flex.ussd.screens.base import UssdPayload, UssdPaginator
+
+
+class UssdPaginatorTests(SimpleTestCase):
+
+	page_size = 60
+
+	def paginate(self, text, foot=('0: Back', '99: Home'), offsets=None):
+		return UssdPaginator(text, self.page_size, '98: More', '0: Prev', foot, offsets)
+
+	def get_text(self, lines=20):
+		payload = UssdPayload()
+		for i in range(lines):
+			payload.append('%d: Product number %d' % (i + 1, i + 1))
+		return str(payload)
+
+	def test_no_page_is_longer_than_the_page_size(self):
+		pages = list(self.paginate(self.get_text()))
+		self.assertGreater(len(pages), 2)
+		for page in pages:
+			self.assertLessEqual(len(page), self.page_size, page)
+
+	def test_pages_hold_every_line_once(self):
+		text = self.get_text()
+		lines = []
+		for page in self.paginate(text):
+			lines.extend(l for l in page.split('\n') if ': Product' in l)
+		self.assertEqual(lines, text.split('\n'))
+
+	def test_footers(self):
+		pages = list(self.paginate(self.get_text()))
+		self.assertEqual(pages[0].split('\n')[-3:], ['0: Back', '98: More', '99: Home'])
+		self.assertEqual(pages[1].split('\n')[-2:], ['0: Prev', '98: More'])
+		self.assertEqual(pages[-1].split('\n')[-1], '0: Prev')
+		self.assertNotIn('98: More', pages[-1])
+
+	def test_a_text_that_fits_is_one_page(self):
+		pages = list(self.paginate('1: Apply\n2: Repay'))
+		self.assertEqual(pages, ['1: Apply\n2: Repay\n0: Back\n99: Home'])
+
+	def test_a_line_longer_than_a_page_is_cut(self):
+		text = 'x' * 150
+		pages = list(self.paginate(text, foot=()))
+		for page in pages:
+			self.assertLessEqual(len(page), self.page_size)
+		self.assertEqual(''.join(p.split('\n')[0] for p in pages), text)
+
+	def test_pages_render_again_from_their_offsets(self):
+		text = self.get_text()
+		paginator = self.paginate(text)
+		pages = list(paginator)
+		for i, page in enumerate(pages):
+			#what a later hop does with the offsets kept in the screen state
+			self.assertEqual(self.paginate(text, offsets=paginator.offsets).page(i), page)
+
+	def test_only_the_pages_asked_for_are_found(self):
+		paginator = self.paginate(self.get_text())
+		paginator.page(0)
+		self.assertEqual(len(paginator.offsets), 2)
+		paginator.page(1)
+		self.assertEqual(len(paginator.offsets), 3)
@@ -0,0 +1,89 @@
+"""Opt-in request tracing for the USSD endpoints.
+
+Tracing is off unless `USSD['TRACE_MSISDNS']` lists some numbers or
+`USSD['TRACE_SAMPLE_RATE']` is above 0. A traced request leaves one record
+in an in-process ring buffer (see `get_traces()`) and in the `ussd.trace`
+logger, so where the records end up is down to the logging config.
+"""
+import json
+import time
+import random
+from collections import deque
+from logging import getLogger
+
+from django.utils.functional import SimpleLazyObject
+
+from .settings import ussd_settings
+
+logger = getLogger('ussd.trace')
+
+
+class Trace(object):
+
+	__slots__ = 'tracer', 'started', 'record'
+
+	def __init__(self, tracer, request):
+		self.tracer = tracer
+		self.started = time.perf_counter()
+		self.record = dict(
+			ts=time.time(),
+			msisdn=request.GET.get('msisdn'),
+			session_id=request.GET.get('session_id'),
+			service_code=request.GET.get('service_code'),
+			ussd_string=request.GET.get('ussd_string'),
+		)
+
+	def finish(self, request, response):
+		session = getattr(request, 'ussd_session', None)
+		state = session and session.state
+		self.record.update(
+			args=list(getattr(request, 'args', None) or ()),
+			screen=state and state.screen,
+			status=response.status_code,
+			size=len(response.content),
+			duration_ms=round((time.perf_counter() - self.started) * 1000, 2),
+		)
+		self.tracer.emit(self.record)
+
+
+class Tracer(object):
+
+	def __init__(self, msisdns=(), sample_rate=0, buffer_size=100):
+		self.msisdns = frozenset(str(m).lstrip('+') for m in msisdns)
+		self.sample_rate = sample_rate
+		self.buffer = deque(maxlen=buffer_size)
+
+	@property
+	def enabled(self):
+		return bool(self.msisdns) or self.sample_rate > 0
+
+	def should_trace(self, request):
+		if str(request.GET.get('msisdn', '')).lstrip('+') in self.msisdns:
+			return True
+		return self.sample_rate > 0 and random.random() < self.sample_rate
+
+	def start(self, request):
+		"""Returns a `Trace` for a sampled request, None otherwise."""
+		if self.enabled and self.should_trace(request):
+			return Trace(self, request)
+		return None
+
+	def emit(self, record):
+		self.buffer.append(record)
+		logger.info(json.dumps(record, default=str))
+
+
+def _get_tracer():
+	return Tracer(
+		ussd_settings.TRACE_MSISDNS,
+		ussd_settings.TRACE_SAMPLE_RATE,
+		ussd_settings.TRACE_BUFFER_SIZE
+	)
+
+
+tracer = SimpleLazyObject(_get_tracer)
+
+
+def get_traces():
+	"""The records of this process, oldest first."""
+	return list(tracer.buffer)
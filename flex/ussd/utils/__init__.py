@@ -176,10 +176,36 @@ class PushList(list):
 
 
 
-_ussd_split_re = r'\*(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)'
+#a "*" outside double quotes
+_ussd_split_re = re.compile(r'\*(?=(?:[^\"]*\"[^\"]*\")*[^\"]*$)')
 
 def split_argstr(s):
-	return re.split(_ussd_split_re, s) if s else []
+	if not s:
+		return []
+	if '"' not in s:
+		return s.split('*')
+	return _ussd_split_re.split(s)
+
+
+#inputs the screens read as navigation
+NAV_BACK = '0'
+NAV_HOME = '99'
+NAV_MORE = '98'
+
+def resolve_nav(inputs):
+	"""Returns the menu path that `inputs` lead to, with the back, home
+	and more inputs applied, e.g. `['1', '2', '98', '0', '3']` to `['1', '3']`.
+	"""
+	rv = []
+	for s in inputs:
+		if s == NAV_BACK:
+			if rv:
+				rv.pop()
+		elif s == NAV_HOME:
+			rv = []
+		elif s != NAV_MORE:
+			rv.append(s)
+	return rv
 
 
 class ArgumentVector(list):
@@ -220,8 +246,43 @@ class ArgumentVector(list):
 		ld = len(self) - len(other)
 		return self[-ld:] if ld > 0 else []
 
+	def since(self, other):
+		"""The inputs that follow those `self` shares with `other`. Unlike
+		`self - other` this holds when the gateway rewrote its history."""
+		i = 1
+		for a, b in zip(self[1:], other[1:]):
+			if a != b:
+				break
+			i += 1
+		return self[i:]
+
 	def __str__(self):
 		return '%s' % '*'.join(self)
 
 	def __repr__(self):
 		return '<ArgumentVector: %s>' % (self,)
+
+
+
+def parse_argv(service_code, argstr, base_code=None, xargv=None, xargstr=None):
+	"""Returns `(argv, inputs)` for a hop: the ArgumentVector of `argstr` and
+	the inputs entered since the previous hop, whose argv `xargv` was parsed
+	from `xargstr`.
+
+	When the gateway only appended to `xargstr`, which it does on all but
+	the first hop, only the appended inputs are parsed. Otherwise the whole
+	string is.
+	"""
+	if xargv and xargstr and service_code and argstr.startswith(xargstr) \
+			and argstr[len(xargstr):len(xargstr)+1] == '*' and not xargstr.count('"') % 2:
+		stripped = base_code and argstr.startswith(base_code)
+		head = '*'.join((service_code, base_code)) if stripped else service_code
+		if head == xargv[0]:
+			inputs = [s.replace('"', '') for s in split_argstr(argstr[len(xargstr)+1:])]
+			argv = ArgumentVector()
+			argv.extend(xargv)
+			argv.extend(inputs)
+			return argv, inputs
+
+	argv = ArgumentVector(service_code, argstr, base_code)
+	return argv, (argv.since(xargv) if xargv else [])
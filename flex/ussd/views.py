@@ -1,4 +1,6 @@
 import io
+from functools import update_wrapper
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
 from django.http import HttpResponse
 from django.views.generic import View
@@ -93,16 +95,25 @@ class UssdView(View):
 
 
 
+class AsyncUssdView(UssdView):
+	"""UssdView for ASGI deployments.
 
+	The screens use the ORM, which is sync only, so a hop is still
+	dispatched on Django's sync thread. What's gained is that the event loop
+	isn't held while the session is read and saved or, with
+	`AsyncUssdMiddleware`, while the gateway is called back.
+	"""
 
+	@classmethod
+	def as_view(cls, **initkwargs):
+		view = super(AsyncUssdView, cls).as_view(**initkwargs)
 
-# CON, END, screen
-
-
-
-
-
-
-
+		async def async_view(request, *args, **kwargs):
+			return await view(request, *args, **kwargs)
 
+		#keeps view_class and what the dispatch decorators set, e.g. csrf_exempt
+		update_wrapper(async_view, view)
+		return async_view
 
+	async def dispatch(self, request, *args, **kwargs):
+		return await sync_to_async(super(AsyncUssdView, self).dispatch)(request, *args, **kwargs)
@@ -5,11 +5,18 @@ from .models import Fund
 
 class FundAdmin(admin.ModelAdmin):
 
-    list_display = ('name','description','balance','is_active',)
-    # readonly_fields = ('name',)
+    list_display = ('name','description','balance','reserved','is_active',)
+    readonly_fields = ('reserved',)
     # ordering = ('-amount',)
     link_display = ('name',)
-    fields = ('name','description','balance','is_active',)
+    fields = ('name','description','balance','reserved','is_active',)
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            #reserved is only ever moved by F() updates; don't write back a stale copy
+            obj.save(update_fields=('name','description','balance','is_active',))
+        else:
+            obj.save()
 
 admin.site.register(Fund,FundAdmin)
 
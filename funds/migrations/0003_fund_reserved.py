@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0002_alter_fund_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fund',
+            name='reserved',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=9),
+        ),
+    ]
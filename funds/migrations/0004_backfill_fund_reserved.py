@@ -0,0 +1,29 @@
+from decimal import Decimal
+from django.db import migrations
+from django.db.models import F, Sum
+
+
+def backfill_reserved(apps, schema_editor):
+    # payouts still pending when reservations were introduced were never
+    # reserved, but committing or releasing them takes them off `reserved`
+    Fund = apps.get_model('funds', 'Fund')
+    PayOut = apps.get_model('payments', 'PayOut')
+    pending = PayOut.objects.filter(status=0, deleted_at__isnull=True)  # PayOutStatusEnum.PENDING
+    totals = {row['fund']: row['total'] for row in pending
+        .values(fund=F('loan__application__product__fund'))
+        .annotate(total=Sum('amount'))}
+    for fund in Fund.objects.all():
+        fund.reserved = totals.get(fund.pk) or Decimal(0)
+        fund.save(update_fields=['reserved'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('funds', '0003_fund_reserved'),
+        ('payments', '0005_payout_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_reserved, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 from factory.models import FactoryModel
 
 # Create your models here.
@@ -8,8 +9,36 @@ class Fund(FactoryModel):
     name = models.CharField(max_length=50,unique=True)
     description = models.CharField(max_length=100)
     balance = models.DecimalField(max_digits=9,decimal_places=2, default=0)
+    reserved = models.DecimalField(max_digits=9,decimal_places=2, default=0)
     is_active = models.BooleanField(default=True)
 
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def available_balance(self):
+        return self.balance - self.reserved
+
+    # Reservations are single conditional UPDATEs on the fund row, so
+    # approvals against the same fund only serialize on that row for the
+    # length of their own transaction.
+
+    @classmethod
+    def reserve(cls,pk,amount):
+        """Set aside `amount` for an approved loan. False if the fund can't cover it."""
+        return cls.objects.filter(
+            pk=pk,balance__gt=F('reserved')+amount
+            ).update(reserved=F('reserved')+amount) == 1
+
+    @classmethod
+    def release(cls,pk,amount):
+        """Give back a reservation whose payout failed."""
+        cls.objects.filter(pk=pk).update(reserved=F('reserved')-amount)
+
+    @classmethod
+    def commit(cls,pk,amount):
+        """Turn a reservation into a debit once its payout went out."""
+        cls.objects.filter(pk=pk).update(
+            balance=F('balance')-amount,
+            reserved=F('reserved')-amount)
+
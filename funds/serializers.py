@@ -5,6 +5,7 @@ from .models import Fund
 class Fundserializer(serializers.ModelSerializer):
 
     is_active = serializers.BooleanField(read_only=True)
+    reserved = serializers.DecimalField(max_digits=9,decimal_places=2,read_only=True)
     
     class Meta:
         model = Fund
@@ -12,5 +13,6 @@ class Fundserializer(serializers.ModelSerializer):
             'name',
             'description',
             'balance',
+            'reserved',
             'is_active',
             )
\ No newline at end of file
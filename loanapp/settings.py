@@ -400,17 +400,38 @@ CACHES = {
 	}
 }
 
+#Worker Settings
+WORKER_LEASE_SECONDS = 300 #margin on top of the worst case time of a leased batch, see Worker.get_lease
+WORKER_IDLE_TIMEOUT = 30 #fallback poll when no queue notification arrives
+RETRY_MAX_ATTEMPTS = 6 #payout/checkout attempts before a row is dead-lettered
+RETRY_BASE_DELAY = 30 #seconds, doubled on every attempt
+RETRY_MAX_DELAY = 60*60
+WORKERS = { #per queue overrides for manage.py runworker
+	'applications': dict(batch_size=50),
+	'payouts': dict(batch_size=50, concurrency=20),
+	'checkouts': dict(batch_size=50, concurrency=10),
+	'payins': dict(batch_size=50),
+	'callbacks': dict(batch_size=200),
+	'pushbacks': dict(batch_size=100, concurrency=20, idle_timeout=1), #short idle poll so retries go out on time
+}
+DEFER_CALLBACKS = False #store IPN callbacks as received and let the callbacks worker apply them
+USSD_PUSHBACK_TTL = 60 #seconds after which a queued MTN push-back is dropped, the gateway has ended the session by then
+
+
 USSD = dict(
 	URLS = (
 		r'^/ussd/$',
+		r'^/ussd/async/$',
 		dict(
 			path=r'^/ussd/gh/mtn/$',
 			methods=('POST',)
 		)
 	),
+	SESSION_BACKEND = 'flex.ussd.backends.RedisHashBackend',
 	SESSION_TIMEOUT = 120,
 	SCREEN_STATE_TIMEOUT = 120,
 	INITIAL_SCREEN = 'jl.initial',
+	SCREEN_UID_MANIFEST = BASE_DIR / 'ussd' / 'screens.json',
 	MAX_PAGE_LENGTH=150
 )
 
@@ -4,7 +4,7 @@ from django.utils import timezone
 from django.utils.translation import gettext as _
 from django import forms
 from .models import Loan,Application,ApplicationStatusEnum
-from factory.helpers import helpers
+from products.pricing import get_pricing,get_quote
 from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator
 from django.utils.html import format_html_join
@@ -31,6 +31,7 @@ class LoanAdmin(admin.ModelAdmin):
     
     list_display = ('get_code','get_client','get_amount','get_charges','get_total_amount','date_due','get_is_disbursed',)
     list_display_links = ('get_code',)
+    list_select_related = ('application__client',)
     readonly_fields = ('get_code','get_client','get_amount','get_charge_details',
         'get_charges','get_total_amount',
         'date_due','disbursed_on','get_is_overdue',
@@ -68,12 +69,9 @@ class LoanAdmin(admin.ModelAdmin):
     get_amount.short_description = 'Requested Amount'
 
     def get_charges(self,obj):
-        charges = 0
-        for charge in obj.application.product.charges.all():
-            charges+=charge.amount
-        loan_interest = helpers.calculate_interest(obj.application)
-        charges+=loan_interest
-        return charges
+        application = obj.application
+        quote = get_quote(application.product_id,application.amount,application.duration)
+        return quote.charges + quote.interest
     get_charges.short_description = 'Total Charges'
 
     def get_total_amount(self,obj):
@@ -90,10 +88,7 @@ class LoanAdmin(admin.ModelAdmin):
     get_code.short_description = '# Loan ID'
 
     def get_charge_details(self,obj):
-        details = []
-        for charge in obj.application.product.charges.all():
-            details.append(f'{charge.name} - {charge.amount}')
-        return details
+        return [f'{name} - {amount}' for name,amount in get_pricing(obj.application.product_id).charges]
     
     get_charge_details.short_description = 'Detail'
 
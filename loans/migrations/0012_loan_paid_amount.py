@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0011_loan_amount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loan',
+            name='paid_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=8),
+        ),
+        migrations.AlterField(
+            model_name='loan',
+            name='date_due',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
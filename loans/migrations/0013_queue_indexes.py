@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:38
+
+from django.db import migrations, models
+import loans.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0012_loan_paid_amount'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', loans.models.ApplicationStatusEnum(1))), fields=['id'], name='loans_application_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+def renumber_duplicate_codes(apps, schema_editor):
+    # the first application of every code keeps it, the ones after it were
+    # handed the same code by concurrent requests and get the next free
+    # code of the same day, the way the daily sequence would have issued it
+    Application = apps.get_model('loans', 'Application')
+    counters = {}
+    seen = set()
+    duplicates = []
+    for pk, code in Application.objects.order_by('id').values_list('id', 'code').iterator():
+        prefix, counter = str(code)[:6], str(code)[6:]
+        if counter.isdigit():
+            counters[prefix] = max(counters.get(prefix, 0), int(counter))
+        if code in seen:
+            duplicates.append((pk, prefix))
+        seen.add(code)
+
+    for pk, prefix in duplicates:
+        counters[prefix] = counters.get(prefix, 0) + 1
+        Application.objects.filter(pk=pk).update(code=int(prefix + str(counters[prefix])))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0013_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_codes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='application',
+            name='code',
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
@@ -22,7 +22,7 @@ class ApplicationStatusEnum(enum.Enum):
     
     __transitions__ = {
         APPROVED: (PENDING,REJECTED),  # Can go from PENDING,REJECTED to APPROVED
-        REJECTED: (PENDING,),  # Can go from PENDING to REJECTED
+        REJECTED: (PENDING,APPROVED),  # Can go from PENDING,APPROVED to REJECTED
         FAILED: (PENDING,APPROVED),  # Can go from PENDING to REJECTED
         PENDING: (FAILED,),  # Can go from PENDING to REJECTED
         PROCESSED: (APPROVED,),  # Can go from APPROVED to PROCESSED
@@ -38,9 +38,16 @@ class Application(FactoryModel):
     status = enum.EnumField(ApplicationStatusEnum)
     notes = models.CharField(max_length=50,null=True,blank=True)
     duration = models.IntegerField()
-    code = models.BigIntegerField()
+    code = models.BigIntegerField(unique=True)
     reviewed_by =models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING,null=True,blank=True)
 
+    class Meta:
+        indexes = [
+            #the applications worker's queue, see get_unprocessed
+            models.Index(fields=['id'],name='loans_application_queue_idx',
+                condition=models.Q(status=ApplicationStatusEnum.APPROVED,deleted_at__isnull=True)),
+        ]
+
     def __str__(self) -> str:
         return self.client.first_name +':-' + str(self.product.name) 
 
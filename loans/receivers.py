@@ -0,0 +1,10 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save
+from factory import notify
+from .models import Application, ApplicationStatusEnum
+
+
+@receiver(post_save, sender=Application)
+def _notify_applications(sender, instance=None, **kw):
+    if instance.status == ApplicationStatusEnum.APPROVED:
+        notify.notify(notify.APPLICATIONS)
@@ -1,3 +1,107 @@
+from decimal import Decimal
+from django.core.cache import cache
 from django.test import TestCase
+from factory.testing import LoanFixturesMixin,QueryPlanMixin
+from funds.models import Fund
+from payments.models import PayOut,PayOutStatusEnum
+from . import underwriting
+from .models import Application,ApplicationStatusEnum,Loan
 
 # Create your tests here.
+
+
+class QueueIndexTests(QueryPlanMixin,TestCase):
+
+    def test_unprocessed_applications_use_queue_index(self):
+        self.assertUsesIndex(Application.get_unprocessed(50),'loans_application_queue_idx')
+
+
+class UnderwritingTests(LoanFixturesMixin,TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product(fund_balance=2500)
+        self.fund = self.product.fund
+
+    def underwrite(self):
+        underwriting.underwrite(underwriting.get_batch(50))
+
+    def assertStatus(self,application,status,notes=None):
+        application.refresh_from_db()
+        self.assertEqual(application.status,status)
+        if notes is not None:
+            self.assertEqual(application.notes,notes)
+
+    def test_accepted_applications_get_a_loan_a_payout_and_a_reservation(self):
+        applications = [self.create_application(self.create_client(self.product),self.product,1000) for i in range(2)]
+        self.underwrite()
+
+        for application in applications:
+            self.assertStatus(application,ApplicationStatusEnum.PROCESSED)
+            loan = Loan.objects.get(application=application)
+            #principal, the 50 charge and 10% interest for one month
+            self.assertEqual(loan.amount,Decimal('1150'))
+            self.assertEqual(PayOut.objects.get(loan=loan).status,PayOutStatusEnum.PENDING)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.reserved,Decimal('2000'))
+
+    def test_applications_beyond_the_fund_balance_are_rejected(self):
+        applications = [self.create_application(self.create_client(self.product),self.product,1000) for i in range(3)]
+        self.underwrite()
+
+        self.assertStatus(applications[0],ApplicationStatusEnum.PROCESSED)
+        self.assertStatus(applications[1],ApplicationStatusEnum.PROCESSED)
+        self.assertStatus(applications[2],ApplicationStatusEnum.REJECTED,underwriting.INSUFFICIENT_FUND_NOTES)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.reserved,Decimal('2000'))
+
+    def test_reservation_failing_at_commit_only_rejects_what_doesnt_fit(self):
+        applications = [self.create_application(self.create_client(self.product),self.product,1000) for i in range(2)]
+        batch = underwriting.get_batch(50)
+        Fund.reserve(self.fund.pk,1000) #a concurrent batch, after this one read the fund
+        underwriting.underwrite(batch)
+
+        self.assertStatus(applications[0],ApplicationStatusEnum.PROCESSED)
+        self.assertStatus(applications[1],ApplicationStatusEnum.REJECTED,underwriting.INSUFFICIENT_FUND_NOTES)
+        self.assertEqual(Loan.objects.count(),1)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.reserved,Decimal('2000'))
+
+    def test_applications_over_the_available_limit_are_rejected(self):
+        application = self.create_application(self.create_client(self.product,limit=500),self.product,1000)
+        self.underwrite()
+        self.assertStatus(application,ApplicationStatusEnum.REJECTED,'Loan Amount more than Available Loan Limit')
+
+    def test_applications_of_inactive_clients_are_rejected(self):
+        application = self.create_application(self.create_client(self.product,is_active=False),self.product,1000)
+        self.underwrite()
+        self.assertStatus(application,ApplicationStatusEnum.REJECTED,'Client is in Inactive State')
+
+    def test_applications_without_a_loan_profile_are_rejected(self):
+        application = self.create_application(self.create_client(self.product,profile=False),self.product,1000)
+        self.underwrite()
+        self.assertStatus(application,ApplicationStatusEnum.REJECTED,underwriting.NO_LOAN_PROFILE_NOTES)
+
+    def test_rejections_reserve_nothing(self):
+        self.create_application(self.create_client(self.product,limit=500),self.product,1000)
+        self.underwrite()
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.reserved,0)
+        self.assertFalse(Loan.objects.exists())
+
+    def test_a_batch_another_worker_underwrote_is_left_alone(self):
+        application = self.create_application(self.create_client(self.product),self.product,1000)
+        stale = underwriting.get_batch(50)
+        self.underwrite()
+        underwriting.underwrite(stale)
+
+        self.assertStatus(application,ApplicationStatusEnum.PROCESSED)
+        self.assertEqual(Loan.objects.count(),1)
+        self.fund.refresh_from_db()
+        self.assertEqual(self.fund.reserved,Decimal('1000'))
+
+    def test_an_application_that_already_has_a_loan_is_not_failed(self):
+        application = self.create_application(self.create_client(self.product),self.product,1000)
+        Loan.objects.create(application=application,amount=1150)
+        self.underwrite()
+        self.assertStatus(application,ApplicationStatusEnum.APPROVED)
@@ -0,0 +1,168 @@
+import logging
+from dateutil.relativedelta import relativedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from clients.models import LoanProfile
+from funds.models import Fund
+from payments.models import PayOut
+from products.pricing import get_quote
+from factory import notify
+from .models import Application,ApplicationStatusEnum,Loan
+
+logger = logging.getLogger(__name__)
+
+INSUFFICIENT_FUND_NOTES = 'Loan Product Fund has Inssufficent Balance'
+
+NO_LOAN_PROFILE_NOTES = 'Client has no Loan Profile for the Product'
+
+
+class InsufficientFund(Exception):
+    pass
+
+
+def get_batch(limit):
+    return list(
+        Application.get_unprocessed(limit)
+        .select_related('client','product__fund')
+        )
+
+
+def get_loan_profiles(applications):
+    profiles = LoanProfile.objects.filter(
+        client__in=set(a.client_id for a in applications),
+        product__in=set(a.product_id for a in applications)).order_by('id')
+    return {(p.client_id,p.product_id):p for p in profiles}
+
+
+def reject(application,notes):
+    application.status = ApplicationStatusEnum.REJECTED
+    application.notes = notes
+
+
+def evaluate(application,loan_profile,funds):
+    """Decide on a single application, in memory.
+
+    Returns the unsaved `Loan` for an accepted application or None. `funds`
+    maps fund ids to what is left of their balance in this batch.
+    """
+    if loan_profile is None:
+        return reject(application,NO_LOAN_PROFILE_NOTES)
+    if loan_profile.available_limit < application.amount:
+        return reject(application,'Loan Amount more than Available Loan Limit')
+    if not application.client.is_active:
+        return reject(application,'Client is in Inactive State')
+
+    fund = application.product.fund
+    balance = funds.setdefault(fund.pk,fund.available_balance)
+    if not balance > application.amount:
+        return reject(application,INSUFFICIENT_FUND_NOTES)
+    funds[fund.pk] = balance - application.amount
+
+    amount = get_quote(application.product_id,application.amount,application.duration).total
+    date_due = timezone.now() + relativedelta(months=application.duration)
+
+    application.status = ApplicationStatusEnum.PROCESSED
+    application.notes = 'Loan Application Queued for Processing'
+    return Loan(application=application,amount=amount,date_due=date_due)
+
+
+def reserve(loans):
+    totals = {}
+    for loan in loans:
+        application = loan.application
+        fund_id = application.product.fund_id
+        totals[fund_id] = totals.get(fund_id,0) + application.amount
+    for fund_id in sorted(totals): #fixed lock order across batches
+        if not Fund.reserve(fund_id,totals[fund_id]):
+            raise InsufficientFund(fund_id)
+
+
+def decide(applications):
+    """Evaluate a batch in memory and return the unsaved loans."""
+    profiles = get_loan_profiles(applications)
+    funds = {}
+    loans = []
+
+    for application in applications:
+        try:
+            loan = evaluate(
+                application,
+                profiles.get((application.client_id,application.product_id)),
+                funds)
+        except Exception as exc:
+            fail(application,exc)
+        else:
+            if loan is not None:
+                loans.append(loan)
+    return loans
+
+
+def save(applications):
+    """Decide on and write a batch in one transaction.
+
+    The applications are locked first and those a concurrent batch has
+    locked or already decided on are left out.
+    """
+    with transaction.atomic():
+        applications = Application.lock(applications,status=ApplicationStatusEnum.APPROVED)
+        if not applications:
+            return
+        loans = decide(applications)
+        reserve(loans)
+        Loan.objects.bulk_create(loans)
+        if any(loan.pk is None for loan in loans):
+            #backends that can't return ids from a bulk insert
+            ids = dict(Loan.objects.filter(
+                application__in=[loan.application_id for loan in loans]
+                ).values_list('application_id','id'))
+            for loan in loans:
+                loan.pk = ids[loan.application_id]
+        PayOut.objects.bulk_create([PayOut.build(loan) for loan in loans])
+        Application.objects.bulk_update(applications,['status','notes'])
+        if loans:
+            notify.notify(notify.PAYOUTS) #bulk_create sends no post_save
+
+
+def fail(application,exc):
+    logger.error(f'{repr(exc)}')
+    application.status = ApplicationStatusEnum.FAILED
+    application.notes = 'Application Processing Failed'
+
+
+def mark(application,status,notes):
+    #left alone if a concurrent batch decided on it in the meantime
+    Application.objects.filter(pk=application.pk,status=ApplicationStatusEnum.APPROVED).update(
+        status=status,
+        notes=notes)
+
+
+def underwrite(applications):
+    """Underwrite a batch of approved applications.
+
+    Profiles, products and funds are loaded up front, charges come from the
+    in-memory pricing catalogue, every check runs in memory and all
+    resulting rows are written in one transaction, together with one fund
+    reservation per fund. If that transaction fails,
+    e.g. because a concurrent batch drained a fund first, the batch is
+    retried one application at a time so that only the applications that
+    can't go through are rejected or failed.
+    """
+    try:
+        save(applications)
+    except Exception as exc:
+        logger.error(f'{repr(exc)}')
+        for application in applications:
+            try:
+                save([application])
+            except InsufficientFund:
+                mark(application,ApplicationStatusEnum.REJECTED,INSUFFICIENT_FUND_NOTES)
+            except IntegrityError as exc:
+                if Loan.all_objects.filter(application=application.pk).exists():
+                    #another worker got there first
+                    logger.info('Application %s already has a loan',application.pk)
+                    continue
+                logger.error(f'{repr(exc)}')
+                mark(application,ApplicationStatusEnum.FAILED,'Application Processing Failed')
+            except Exception as exc:
+                logger.error(f'{repr(exc)}')
+                mark(application,ApplicationStatusEnum.FAILED,'Application Processing Failed')
@@ -0,0 +1,17 @@
+from factory import notify
+from factory.workers import Worker, register
+from . import underwriting
+
+
+@register
+class ApplicationsWorker(Worker):
+    """Underwrites approved loan applications."""
+
+    queue = notify.APPLICATIONS
+
+    def fetch(self,limit):
+        #underwriting.save() locks the batch before deciding on it
+        return underwriting.get_batch(limit=limit)
+
+    def process(self,applications):
+        underwriting.underwrite(applications)
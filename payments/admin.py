@@ -1,19 +1,25 @@
 from django.contrib import admin
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils import timezone
 from django.utils.translation import gettext as _
 from django import forms
-from .models import PayOut,PayIn
+from funds.models import Fund
+from factory import notify
+from .models import PayOut,PayIn,PayOutStatusEnum
 # Register your models here.
 
 class PayOutAdmin(admin.ModelAdmin):
 
     # fields = ('receiving_phone','amount','status','notes','created_at','application',)
-    list_display = ('receiving_phone','amount','status','notes','get_created_at',)
+    list_display = ('receiving_phone','amount','status','attempts','notes','get_created_at',)
     list_display_links = ('receiving_phone',)
-    readonly_fields = ('receiving_phone','amount','notes','created_at','loan','get_client',)
+    list_filter = ('status',)
+    readonly_fields = ('receiving_phone','amount','notes','created_at','loan','get_client','attempts','next_attempt_at',)
+    actions = ('requeue',)
 
     fieldsets = (
         (None, {'fields': ('receiving_phone','amount','status','notes','get_created_at',)}),
+        ('Retries', {'fields': ('attempts','next_attempt_at',)}),
         ('Loan Application Details', {'fields': ('loan',)}),
         ('Client Details', {'fields': ('get_client',)}), 
     )
@@ -37,6 +43,22 @@ class PayOutAdmin(admin.ModelAdmin):
     
     get_created_at.short_description = 'Initiated At'
 
+    def requeue(self,request,queryset):
+        requeued = 0
+        for payout in queryset.filter(status=PayOutStatusEnum.DEAD).select_related('loan__application__product'):
+            #funds were released when the payout was dead-lettered
+            if not Fund.reserve(payout.loan.application.product.fund_id,payout.amount):
+                self.message_user(request,_('Insufficient fund balance to requeue %s') % payout,messages.ERROR)
+                continue
+            PayOut.objects.filter(pk=payout.pk).update(
+                status=PayOutStatusEnum.PENDING,attempts=0,next_attempt_at=timezone.now())
+            requeued+=1
+        if requeued:
+            notify.publish(notify.PAYOUTS)
+        self.message_user(request,_('%d payouts requeued') % requeued)
+
+    requeue.short_description = 'Requeue dead-lettered payouts'
+
 class PayInAdmin(admin.ModelAdmin):
 
 
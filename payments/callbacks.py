@@ -0,0 +1,140 @@
+import json
+import hashlib
+import logging
+import arrow
+from django.db import transaction
+from django.utils import timezone
+from clients.models import Client
+from loans.models import Application,ApplicationStatusEnum,Loan
+from .models import PayIn,PayOut,PayOutStatusEnum,Callback,CallbackKindEnum,CallbackStatusEnum
+
+logger = logging.getLogger(__name__)
+
+PAYIN_FIELDS = ('TransID','TransTime','TransAmount','MSISDN')
+
+PAYOUT_RESULT_FIELDS = ('transaction_id',)
+
+
+class InvalidCallback(ValueError):
+    pass
+
+
+def validate(data,fields):
+    missing = [f for f in fields if not data.get(f)]
+    if missing:
+        raise InvalidCallback('Missing %s' % ', '.join(missing))
+    return data
+
+
+def stage_payin(data):
+    validate(data,PAYIN_FIELDS)
+    Callback.stage(CallbackKindEnum.PAYIN,data['TransID'],data)
+
+
+def stage_payout_result(data):
+    validate(data,PAYOUT_RESULT_FIELDS)
+    #a payout can get more than one result; only identical resends are dropped
+    key = hashlib.sha1(json.dumps(data,sort_keys=True).encode('utf-8')).hexdigest()
+    Callback.stage(CallbackKindEnum.PAYOUT_RESULT,key,data)
+
+
+def normalize_msisdn(msisdn):
+    return str(msisdn).strip('+').strip()
+
+
+def build_payins(payloads):
+    """Build the unsaved payins for C2B callbacks, resolving all their
+    clients and loans in one query each."""
+    msisdns = set(normalize_msisdn(data.get('MSISDN')) for data in payloads)
+    clients = {normalize_msisdn(c.msisdn):c for c in Client.objects.filter(msisdn__in=msisdns)}
+
+    codes = set(data.get('BillRefNumber') for data in payloads)
+    codes = [int(code) for code in codes if code and str(code).isdigit()]
+    loans = {str(loan.application.code):loan for loan in Loan.objects.filter(
+        application__code__in=codes,is_disbursed=True).select_related('application').order_by('id')}
+
+    return [PayIn(
+        client=clients.get(normalize_msisdn(data.get('MSISDN'))),
+        loan=loans.get(str(data.get('BillRefNumber'))),
+        amount=data.get('TransAmount'),
+        mpesa_code=data.get('TransID'),
+        bill_ref_no=data.get('BillRefNumber'),
+        transaction_date=arrow.get(data.get('TransTime'),"YYYYMMDDHHmmss").datetime,
+        raw=data,
+        ) for data in payloads]
+
+
+def apply_payins(callbacks):
+    PayIn.ingest(*build_payins([c.payload for c in callbacks]))
+    for callback in callbacks:
+        callback.status = CallbackStatusEnum.PROCESSED
+
+
+def apply_payout_results(callbacks):
+    applications = Application.objects.filter(
+        ref_no__in=set(c.payload.get('transaction_id') for c in callbacks)
+        ).select_related('loan__payout')
+    applications = {a.ref_no:a for a in applications}
+    payouts,loans,processed = {},{},{}
+
+    for callback in callbacks:
+        data = callback.payload
+        application = applications.get(data.get('transaction_id'))
+        loan = getattr(application,'loan',None)
+        payout = getattr(loan,'payout',None)
+        if payout is None:
+            callback.status = CallbackStatusEnum.ERRORED
+            callback.notes = 'Payout Not Found'
+            continue
+
+        payout.notes = data.get('result_description')
+        payout.result_code = data.get('result_code')
+        payout.results = data.get('results')
+        payout.mpesa_code = data.get('mpesa_transaction_id')
+        payout.status = PayOutStatusEnum.PROCESSED
+        loan.is_disbursed = True
+        loan.disbursed_on = timezone.now()
+        if application.status != ApplicationStatusEnum.PROCESSED:
+            application.status = ApplicationStatusEnum.PROCESSED
+        payouts[payout.pk] = payout
+        loans[loan.pk] = loan
+        processed[application.pk] = application
+        callback.status = CallbackStatusEnum.PROCESSED
+
+    PayOut.objects.bulk_update(payouts.values(),['notes','result_code','results','mpesa_code','status'])
+    Loan.objects.bulk_update(loans.values(),['is_disbursed','disbursed_on'])
+    Application.objects.bulk_update(processed.values(),['status'])
+
+
+APPLY = {
+    CallbackKindEnum.PAYIN:apply_payins,
+    CallbackKindEnum.PAYOUT_RESULT:apply_payout_results,
+}
+
+
+def apply(callbacks):
+    with transaction.atomic():
+        #callbacks taken by a concurrent batch are left to it
+        callbacks = Callback.lock(callbacks,status=CallbackStatusEnum.PENDING)
+        kinds = {}
+        for callback in callbacks:
+            kinds.setdefault(callback.kind,[]).append(callback)
+        for kind,group in kinds.items():
+            APPLY[kind](group)
+        Callback.objects.bulk_update(callbacks,['status','notes'])
+
+
+def process(callbacks):
+    """Apply a batch of staged callbacks, falling back to one at a time."""
+    try:
+        apply(callbacks)
+    except Exception as exc:
+        logger.error(f'{repr(exc)}')
+        for callback in callbacks:
+            try:
+                apply([callback])
+            except Exception as exc:
+                logger.error(f'{repr(exc)}')
+                Callback.objects.filter(pk=callback.pk,status=CallbackStatusEnum.PENDING).update(
+                    status=CallbackStatusEnum.ERRORED,
+                    notes='Error Processing Callback')
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import django_enumfield.db.fields
+import payments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('loans', '0012_loan_paid_amount'),
+        ('payments', '0004_auto_20210712_0211'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Checkout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('ref_no', models.IntegerField()),
+                ('msisdn', models.CharField(max_length=13)),
+                ('status', django_enumfield.db.fields.EnumField(default=0, enum=payments.models.CheckOutStatusEnum)),
+                ('notes', models.TextField(null=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RenameField(
+            model_name='payout',
+            old_name='receipient_phone',
+            new_name='receiving_phone',
+        ),
+        migrations.AddField(
+            model_name='payin',
+            name='loan',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='loans.loan'),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='claimed_by',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='payout',
+            name='result_code',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='payout',
+            name='notes',
+            field=models.TextField(),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:38
+
+from django.db import migrations, models
+import payments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_payout_retries'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkout',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', payments.models.CheckOutStatusEnum(0))), fields=['next_attempt_at', 'id'], name='payments_checkout_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payin',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('loan__isnull', False), ('status', payments.models.PayInStatusEnum(0))), fields=['id'], name='payments_payin_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payout',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', payments.models.PayOutStatusEnum(0))), fields=['next_attempt_at', 'id'], name='payments_payout_queue_idx'),
+        ),
+    ]
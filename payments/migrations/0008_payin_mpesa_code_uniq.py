@@ -0,0 +1,32 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:39
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def soft_delete_duplicates(apps, schema_editor):
+    # keep the first payin of every mpesa_code, the ones after it are
+    # resent callbacks
+    PayIn = apps.get_model('payments', 'PayIn')
+    seen = set()
+    duplicates = []
+    for pk, code in PayIn.objects.filter(deleted_at__isnull=True).order_by('id').values_list('id', 'mpesa_code').iterator():
+        if code in seen:
+            duplicates.append(pk)
+        seen.add(code)
+    PayIn.objects.filter(id__in=duplicates).update(deleted_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(soft_delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payin',
+            constraint=models.UniqueConstraint(condition=models.Q(('deleted_at__isnull', True)), fields=('mpesa_code',), name='payments_payin_mpesa_code_uniq'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.utils.timezone
+import django_enumfield.db.fields
+import payments.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_payin_mpesa_code_uniq'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Callback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('kind', django_enumfield.db.fields.EnumField(enum=payments.models.CallbackKindEnum)),
+                ('key', models.CharField(max_length=64)),
+                ('payload', models.JSONField()),
+                ('status', django_enumfield.db.fields.EnumField(default=0, enum=payments.models.CallbackStatusEnum)),
+                ('notes', models.CharField(blank=True, max_length=50, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='callback',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', payments.models.CallbackStatusEnum(0))), fields=['id'], name='payments_callback_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='callback',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='payments_callback_kind_key_uniq'),
+        ),
+    ]
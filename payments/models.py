@@ -1,6 +1,7 @@
 from typing import Tuple
 from django.db import models
-from factory.models import FactoryModel
+from factory.models import FactoryModel, RetryModel
+from factory import notify
 from django_enumfield import enum
 from django.utils import timezone
 
@@ -17,6 +18,19 @@ class PayInStatusEnum(enum.Enum):
 
 class PayOutStatusEnum(enum.Enum):
     
+    PENDING = 0
+    PROCESSED = 1
+    ERRORED = 2
+    DEAD = 3 #retries exhausted
+    __default__ = PENDING
+
+class CallbackKindEnum(enum.Enum):
+
+    PAYIN = 1
+    PAYOUT_RESULT = 2
+
+class CallbackStatusEnum(enum.Enum):
+
     PENDING = 0
     PROCESSED = 1
     ERRORED = 2
@@ -27,6 +41,7 @@ class CheckOutStatusEnum(enum.Enum):
     PENDING = 0
     PROCESSED = 1
     ERRORED = 2
+    DEAD = 3 #retries exhausted
     __default__ = PENDING
 
 
@@ -42,12 +57,35 @@ class PayIn(FactoryModel):
     notes = models.CharField(max_length=50)
     raw = models.JSONField()
 
+    class Meta:
+        indexes = [
+            #the payins worker's queue, see get_unprocessed
+            models.Index(fields=['id'],name='payments_payin_queue_idx',
+                condition=models.Q(status=PayInStatusEnum.PENDING,loan__isnull=False,deleted_at__isnull=True)),
+        ]
+        constraints = [
+            #M-Pesa resends a callback it didn't get an answer to
+            models.UniqueConstraint(fields=['mpesa_code'],name='payments_payin_mpesa_code_uniq',
+                condition=models.Q(deleted_at__isnull=True)),
+        ]
+
+    @classmethod
+    def ingest(cls,*payins):
+        """Store payins, skipping those whose `mpesa_code` already exists.
+
+        The insert is an INSERT .. ON CONFLICT DO NOTHING, so concurrent
+        deliveries of the same callback store a single row.
+        """
+        cls.objects.bulk_create(payins,ignore_conflicts=True)
+        if any(payin.loan_id for payin in payins):
+            notify.notify(notify.PAYINS) #bulk_create sends no post_save
+
     @classmethod
     def get_unprocessed(cls,limit):
-        return cls.objects.filter(status=PayInStatusEnum.default()).exclude(loan__isnull=True).order_by('id')[:limit]
+        return cls.objects.filter(status=PayInStatusEnum.default(),loan__isnull=False).order_by('id')[:limit]
 
 
-class PayOut(FactoryModel):
+class PayOut(FactoryModel,RetryModel):
     
     loan = models.OneToOneField('loans.Loan', on_delete=models.DO_NOTHING)
     amount =models.DecimalField(max_digits=7,decimal_places=2)
@@ -58,33 +96,88 @@ class PayOut(FactoryModel):
     results = models.JSONField(default=dict)
     result_code = models.CharField(max_length=10,null=True,blank=True)
 
+    class Meta:
+        indexes = [
+            #the payouts worker's queue, see get_unprocessed
+            models.Index(fields=['next_attempt_at','id'],name='payments_payout_queue_idx',
+                condition=models.Q(status=PayOutStatusEnum.PENDING,deleted_at__isnull=True)),
+        ]
+
     def __str__(self) -> str:
         return self.receiving_phone + ' #' + str(self.amount)
 
     @classmethod
     def get_unprocessed(cls,limit):
-        return cls.objects.filter(status=PayOutStatusEnum.default()).order_by('id')[:limit]
-
+        return cls.due().order_by('next_attempt_at','id')[:limit]
 
+    @classmethod
+    def claim_unprocessed(cls,limit,worker,lease):
+        return super().claim_unprocessed(limit,worker,lease).select_related(
+            'loan__application__client',
+            'loan__application__product')
 
     @classmethod
-    def create(cls,loan):
+    def build(cls,loan):
         amount = loan.application.amount
         receiving_phone = str(loan.application.client.msisdn).strip('+').strip()
-        return cls.objects.create(loan=loan,amount=amount,receiving_phone=receiving_phone)
+        return cls(loan=loan,amount=amount,receiving_phone=receiving_phone)
+
+    @classmethod
+    def create(cls,loan):
+        payout = cls.build(loan)
+        payout.save()
+        return payout
 
     
-class Checkout(FactoryModel):
+class Checkout(FactoryModel,RetryModel):
     
     amount = models.DecimalField(max_digits=7,decimal_places=2)
     ref_no = models.IntegerField()
     msisdn = models.CharField(max_length=13)
     status = enum.EnumField(CheckOutStatusEnum)
     notes = models.TextField(null=True)
+
+    class Meta:
+        indexes = [
+            #the checkouts worker's queue, see get_unprocessed
+            models.Index(fields=['next_attempt_at','id'],name='payments_checkout_queue_idx',
+                condition=models.Q(status=CheckOutStatusEnum.PENDING,deleted_at__isnull=True)),
+        ]
+
     @classmethod
     def get_unprocessed(cls,limit):
-        return cls.objects.filter(status=CheckOutStatusEnum.default()).order_by('id')[:limit]
+        return cls.due().order_by('next_attempt_at','id')[:limit]
+
+
 
 
 
 
+class Callback(FactoryModel):
+    """A gateway callback stored as received, applied later by the callbacks worker."""
+
+    kind = enum.EnumField(CallbackKindEnum)
+    key = models.CharField(max_length=64)
+    payload = models.JSONField()
+    status = enum.EnumField(CallbackStatusEnum)
+    notes = models.CharField(max_length=50,null=True,blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind','key'],name='payments_callback_kind_key_uniq'),
+        ]
+        indexes = [
+            #the callbacks worker's queue, see get_unprocessed
+            models.Index(fields=['id'],name='payments_callback_queue_idx',
+                condition=models.Q(status=CallbackStatusEnum.PENDING,deleted_at__isnull=True)),
+        ]
+
+    @classmethod
+    def stage(cls,kind,key,payload):
+        """Append a callback; a resent one with the same `key` is dropped."""
+        cls.objects.bulk_create([cls(kind=kind,key=key,payload=payload)],ignore_conflicts=True)
+        notify.notify(notify.CALLBACKS)
+
+    @classmethod
+    def get_unprocessed(cls,limit):
+        return cls.objects.filter(status=CallbackStatusEnum.PENDING).order_by('id')[:limit]
@@ -0,0 +1,113 @@
+import logging
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+from clients.models import LoanProfile
+from clients.cache import invalidate as invalidate_client_profiles
+from loans.models import Loan
+from transactions.models import Transaction, TransactionTypeEnum
+from .models import PayIn,PayInStatusEnum
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch(limit):
+    return list(
+        PayIn.get_unprocessed(limit)
+        .select_related('client','loan__application__client','loan__application__product')
+        )
+
+
+def get_loan_profiles(payins):
+    profiles = LoanProfile.objects.filter(
+        client__in=set(p.client_id for p in payins),
+        product__in=set(p.loan.application.product_id for p in payins)).order_by('id')
+    return {(p.client_id,p.product_id):p for p in profiles}
+
+
+def increment(queryset,field,amounts):
+    """Add `amounts[pk]` to `field` of each row, in a single UPDATE.
+
+    The increment is applied by the database, so payments posted by
+    concurrent batches add up instead of overwriting one another.
+    """
+    if not amounts:
+        return
+    delta = Case(
+        *(When(pk=pk,then=Value(amount)) for pk,amount in amounts.items()),
+        default=Value(Decimal(0)),
+        output_field=DecimalField(max_digits=8,decimal_places=2))
+    queryset.filter(pk__in=amounts).update(**{field:F(field)+delta})
+
+
+def post(payins):
+    """Post a batch of payins in one transaction.
+
+    The payins are locked first and those a concurrent batch has locked or
+    already posted are left out, so no repayment is credited twice. Payins
+    for the same loan are summed so that every loan and loan profile gets a
+    single increment, and a loan is cleared once its paid amount covers it.
+    """
+    loans = {}
+    limits = {}
+    now = timezone.now()
+
+    with transaction.atomic():
+        payins = PayIn.lock(payins,status=PayInStatusEnum.PENDING)
+        if not payins:
+            return
+        profiles = get_loan_profiles(payins)
+        for item in payins:
+            loans[item.loan_id] = loans.get(item.loan_id,0) + item.amount
+            profile = profiles[(item.client_id,item.loan.application.product_id)]
+            limits[profile.pk] = limits.get(profile.pk,0) + item.amount
+            item.status = PayInStatusEnum.PROCESSED
+
+        increment(LoanProfile.objects,'available_limit',limits)
+        increment(Loan.objects,'paid_amount',loans)
+        Loan.objects.filter(
+            pk__in=loans,
+            is_cleared=False,
+            paid_amount__gte=F('amount')).update(is_cleared=True,cleared_on=now)
+        Transaction.objects.bulk_create([
+            Transaction(
+                client=item.loan.application.client,
+                type=TransactionTypeEnum.CREDIT,
+                product=item.loan.application.product,
+                subject='Loan Repayment',
+                initial_balance=item.loan.amount,
+                amount=item.amount,
+                ref=item.loan)
+            for item in payins])
+        PayIn.objects.bulk_update(payins,['status'])
+        #the F() increments bypass the LoanProfile signals
+        invalidate_client_profiles(*(item.loan.application.client.msisdn for item in payins))
+
+
+def fail(payins,exc):
+    logger.error(f'{repr(exc)}')
+    #left alone if a concurrent batch posted them in the meantime
+    PayIn.objects.filter(pk__in=[item.pk for item in payins],status=PayInStatusEnum.PENDING).update(
+        status=PayInStatusEnum.ERRORED,
+        notes="Error Processing Payin")
+
+
+def process(payins):
+    """Post a batch of payins, falling back to one loan at a time.
+
+    A payin that can't be posted, e.g. because its client has no loan
+    profile for the product, then only errors the payins of its own loan.
+    """
+    try:
+        post(payins)
+    except Exception as exc:
+        logger.error(f'{repr(exc)}')
+        loans = {}
+        for item in payins:
+            loans.setdefault(item.loan_id,[]).append(item)
+        for group in loans.values():
+            try:
+                post(group)
+            except Exception as exc:
+                fail(group,exc)
@@ -0,0 +1,22 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save
+from factory import notify
+from .models import PayIn, PayInStatusEnum, PayOut, PayOutStatusEnum, Checkout, CheckOutStatusEnum
+
+
+@receiver(post_save, sender=PayIn)
+def _notify_payins(sender, instance=None, **kw):
+    if instance.status == PayInStatusEnum.PENDING and instance.loan_id:
+        notify.notify(notify.PAYINS)
+
+
+@receiver(post_save, sender=PayOut)
+def _notify_payouts(sender, instance=None, **kw):
+    if instance.status == PayOutStatusEnum.PENDING:
+        notify.notify(notify.PAYOUTS)
+
+
+@receiver(post_save, sender=Checkout)
+def _notify_checkouts(sender, instance=None, **kw):
+    if instance.status == CheckOutStatusEnum.PENDING:
+        notify.notify(notify.CHECKOUTS)
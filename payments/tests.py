@@ -1,3 +1,202 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase,TransactionTestCase
+from django.utils import timezone
+from clients.models import LoanProfile
+from factory.testing import LoanFixturesMixin,QueryPlanMixin
+from loans.models import Loan
+from transactions.models import Transaction
+from . import posting
+from .models import PayIn,PayInStatusEnum,PayOut,Checkout
 
 # Create your tests here.
+
+
+class QueueIndexTests(QueryPlanMixin,TestCase):
+
+    def test_unprocessed_payins_use_queue_index(self):
+        self.assertUsesIndex(PayIn.get_unprocessed(50),'payments_payin_queue_idx')
+
+    def test_unprocessed_payouts_use_queue_index(self):
+        self.assertUsesIndex(PayOut.get_unprocessed(50),'payments_payout_queue_idx')
+
+    def test_unprocessed_checkouts_use_queue_index(self):
+        self.assertUsesIndex(Checkout.get_unprocessed(50),'payments_checkout_queue_idx')
+
+
+class PostingTests(LoanFixturesMixin,TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.product = self.create_product()
+
+    def create_loan(self,amount=1150,profile=True):
+        client = self.create_client(self.product,profile=profile)
+        application = self.create_application(client,self.product,1000)
+        return Loan.objects.create(application=application,amount=amount,is_disbursed=True)
+
+    def create_payin(self,loan,amount):
+        return PayIn.objects.create(
+            client=loan.application.client,
+            loan=loan,
+            amount=amount,
+            mpesa_code='P%d' % PayIn.objects.count(),
+            transaction_date=timezone.now(),
+            notes='',
+            raw={})
+
+    def post(self):
+        posting.process(posting.get_batch(50))
+
+    def get_available_limit(self,loan):
+        return LoanProfile.objects.get(client=loan.application.client_id).available_limit
+
+    def test_payins_of_a_loan_add_up(self):
+        loan = self.create_loan()
+        payins = [self.create_payin(loan,500),self.create_payin(loan,Decimal('300.50'))]
+        self.post()
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.paid_amount,Decimal('800.50'))
+        self.assertFalse(loan.is_cleared)
+        self.assertEqual(self.get_available_limit(loan),Decimal('5800.50'))
+        self.assertEqual(Transaction.objects.filter(subject='Loan Repayment').count(),2)
+        for payin in payins:
+            payin.refresh_from_db()
+            self.assertEqual(payin.status,PayInStatusEnum.PROCESSED)
+
+    def test_payins_of_several_loans_are_kept_apart(self):
+        loans = [self.create_loan(),self.create_loan()]
+        self.create_payin(loans[0],100)
+        self.create_payin(loans[1],200)
+        self.create_payin(loans[1],300)
+        self.post()
+
+        for loan,paid in zip(loans,(100,500)):
+            loan.refresh_from_db()
+            self.assertEqual(loan.paid_amount,paid)
+            self.assertEqual(self.get_available_limit(loan),5000 + paid)
+
+    def test_a_loan_is_cleared_once_it_is_paid(self):
+        loan = self.create_loan()
+        self.create_payin(loan,1000)
+        self.post()
+        loan.refresh_from_db()
+        self.assertFalse(loan.is_cleared)
+
+        self.create_payin(loan,150)
+        self.post()
+        loan.refresh_from_db()
+        self.assertTrue(loan.is_cleared)
+        self.assertIsNotNone(loan.cleared_on)
+        self.assertEqual(loan.paid_amount,Decimal('1150'))
+
+    def test_payins_that_cant_be_posted_only_error_their_own_loan(self):
+        good,bad = self.create_loan(),self.create_loan(profile=False)
+        self.create_payin(good,100)
+        failed = self.create_payin(bad,100)
+        self.post()
+
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual(good.paid_amount,100)
+        self.assertEqual(bad.paid_amount,0)
+        self.assertEqual(failed.status,PayInStatusEnum.ERRORED)
+
+    def test_a_batch_another_worker_posted_is_not_credited_again(self):
+        loan = self.create_loan()
+        self.create_payin(loan,500)
+        stale = posting.get_batch(50)
+        self.post()
+        posting.process(stale)
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.paid_amount,500)
+        self.assertEqual(self.get_available_limit(loan),5500)
+        self.assertEqual(Transaction.objects.filter(subject='Loan Repayment').count(),1)
+
+
+class PayoutClaimMixin(LoanFixturesMixin):
+
+    def create_payouts(self,n):
+        cache.clear()
+        product = self.create_product()
+        client = self.create_client(product)
+        payouts = []
+        for i in range(n):
+            loan = Loan.objects.create(application=self.create_application(client,product,1000),amount=1150)
+            payouts.append(PayOut.create(loan))
+        return payouts
+
+
+class PayoutClaimTests(PayoutClaimMixin,TestCase):
+
+    def setUp(self):
+        self.payouts = self.create_payouts(4)
+
+    def claim(self,worker,limit=2,lease=60):
+        return [p.pk for p in PayOut.claim_unprocessed(limit=limit,worker=worker,lease=lease)]
+
+    def test_workers_get_different_payouts(self):
+        a,b = self.claim('a'),self.claim('b')
+        self.assertEqual(len(a),2)
+        self.assertEqual(len(b),2)
+        self.assertFalse(set(a) & set(b))
+        self.assertEqual(self.claim('c'),[])
+
+    def test_an_expired_lease_can_be_claimed_again(self):
+        claimed = self.claim('a',limit=4)
+        PayOut.objects.filter(pk=claimed[0]).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.claim('b'),claimed[:1])
+
+    def test_a_released_payout_is_saved_without_its_lease(self):
+        payout = PayOut.claim_unprocessed(limit=1,worker='a',lease=60)[0]
+        self.assertEqual(payout.claimed_by,'a')
+        payout.release()
+        payout.retry('Disbursement Timed Out')
+        payout.save()
+        payout.refresh_from_db()
+        self.assertIsNone(payout.claimed_by)
+        self.assertIsNone(payout.lease_expires_at)
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked,'needs SELECT ... FOR UPDATE SKIP LOCKED')
+class PayoutClaimConcurrencyTests(PayoutClaimMixin,TransactionTestCase):
+
+    workers = 8
+
+    def test_concurrent_workers_never_claim_the_same_payout(self):
+        payouts = self.create_payouts(60)
+        claims = {}
+        errors = []
+        barrier = threading.Barrier(self.workers)
+
+        def work(worker):
+            try:
+                barrier.wait()
+                claimed = claims[worker] = []
+                while True:
+                    batch = [p.pk for p in PayOut.claim_unprocessed(limit=3,worker=worker,lease=60)]
+                    if not batch:
+                        break
+                    claimed.extend(batch)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=work,args=('w%d' % i,)) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors,[])
+        claimed = [pk for batch in claims.values() for pk in batch]
+        self.assertEqual(sorted(claimed),sorted(p.pk for p in payouts))
+        self.assertGreater(sum(1 for batch in claims.values() if batch),1)
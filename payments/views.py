@@ -1,7 +1,6 @@
 from email.mime import application
 from django.shortcuts import render
 from django.views import View
-from factory.helpers import helpers
 from payments.models import PayIn, PayOutStatusEnum
 from payments.models import PayOut,PayInStatusEnum
 from loans.models import Application,ApplicationStatusEnum,Loan
@@ -9,9 +8,10 @@ from django.http import HttpResponse,JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.utils import timezone
-import arrow
 import json
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from . import callbacks
 
 # Create your views here.
 
@@ -19,27 +19,19 @@ class Payins(View):
     
     def post(self,request):
         data = json.loads(request.body.decode('utf-8'))
+
+        if settings.DEFER_CALLBACKS:
+            try:
+                callbacks.stage_payin(data)
+            except callbacks.InvalidCallback as exc:
+                return JsonResponse({'status':'Rejected','error':str(exc)},status=400)
+            return JsonResponse({'status':'Accepted'})
+
         transaction_id = data.get('TransID')
-        transaction_time = data.get('TransTime')
-        transaction_amount = data.get('TransAmount')
-        bill_reference_number = data.get('BillRefNumber')
-        msisdn = data.get('MSISDN')
-        
-        
-        client = helpers.get_client_by_msisdn(msisdn)
-        loan = helpers.get_loan_by_code(bill_reference_number)
-        timestamp = arrow.get(transaction_time, "YYYYMMDDHHmmss")
-        transaction_date = timestamp.datetime
-        PayIn.objects.create(
-            client=client,
-            loan = loan,
-            amount=transaction_amount,
-            mpesa_code=transaction_id,
-            bill_ref_no=bill_reference_number,
-            transaction_date=transaction_date,
-            
-            raw = data,
-            )
+        if PayIn.objects.filter(mpesa_code=transaction_id).exists():
+            return JsonResponse({'status':'Accepted'}) #a resent callback
+
+        PayIn.ingest(*callbacks.build_payins([data]))
     
         return JsonResponse({'status':'Accepted'})
 
@@ -51,6 +43,13 @@ class PayoutResponse(View):
     def post(self,request):
         data = json.loads(request.body.decode('utf-8'))
 
+        if settings.DEFER_CALLBACKS:
+            try:
+                callbacks.stage_payout_result(data)
+            except callbacks.InvalidCallback as exc:
+                return JsonResponse({'status':'Rejected','error':str(exc)},status=400)
+            return JsonResponse({'status':'Accepted'})
+
         ref_no = data.get('transaction_id')
         result_code = data.get('result_code')
         results = data.get('results')
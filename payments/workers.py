@@ -0,0 +1,272 @@
+import hashlib
+import logging
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from clients.models import LoanProfile
+from funds.models import Fund
+from transactions.models import TransactionTypeEnum
+from factory import notify
+from factory.helpers import helpers, mpesa_token
+from factory.workers import Worker, register
+from .models import PayOut,PayOutStatusEnum,Checkout,CheckOutStatusEnum,Callback
+from . import callbacks, posting
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+logger = logging.getLogger(__name__)
+
+
+def get_http_session(pool_size):
+    #one keep-alive pool shared by all in-flight requests of a worker
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1,pool_maxsize=pool_size)
+    session.mount('https://',adapter)
+    session.mount('http://',adapter)
+    session.verify = False
+    return session
+
+
+HTTP_TIMEOUT = 30 #seconds, for the connect and again for the read
+
+
+def post(session,url,headers,payload):
+    return session.post(url,json=payload,headers=headers,timeout=HTTP_TIMEOUT)
+
+
+#failures worth another attempt; anything else errors the row for good
+RETRYABLE_ERRORS = (
+    requests.exceptions.Timeout,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.HTTPError,
+    )
+
+
+def get_key(msisdn,amount,reference_number):
+    conf = settings.IPN_CONFIG
+    app_key = conf.get('app-key')
+    app_secret = conf.get('app-secret')
+
+
+    key_text=(msisdn+str(amount)+app_key+app_secret+reference_number).encode('utf-8')
+    return hashlib.sha256(key_text).hexdigest()
+
+
+@register
+class PayoutsWorker(Worker):
+    """Disburses approved loans through the IPN payouts endpoint."""
+
+    queue = notify.PAYOUTS
+
+    concurrency = 20
+
+    item_timeout = 2 * HTTP_TIMEOUT
+
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.url = settings.IPN_CONFIG.get('payouts_url')
+        self.session = get_http_session(self.concurrency)
+
+    def fetch(self,limit):
+        return self.claim(PayOut,limit)
+
+    def get_payload(self,item):
+        msisdn = item.receiving_phone
+        amount = int(item.amount)
+        ref_no = item.loan.application.ref_no
+        key = get_key(msisdn,amount,ref_no)
+
+        return { 'msisdn':msisdn,
+                 'amount':amount,
+                 'reference_number':ref_no,
+                 'key':key
+               }
+
+    def send(self,payload):
+        response = post(self.session,self.url,None,payload)
+        if response.status_code >= 500:
+            response.raise_for_status()
+        return response.json()
+
+    def get_loan_profiles(self,payouts):
+        applications = [item.loan.application for item in payouts]
+        profiles = LoanProfile.objects.filter(
+            client__in=set(a.client_id for a in applications),
+            product__in=set(a.product_id for a in applications))
+        return {(p.client_id,p.product_id):p for p in profiles}
+
+    def process(self,payouts):
+        loan_profiles = self.get_loan_profiles(payouts)
+        payloads = {}
+        for item in payouts:
+            item.release() #cleared by whichever save() records the outcome
+            payloads[item.pk] = self.get_payload(item)
+
+        #only the HTTP round-trips run on the pool; results are recorded
+        #here, on the thread that owns the DB connection, as they complete.
+        for item,future in self.submit(payouts,lambda item: self.send(payloads[item.pk])):
+            try:
+                loan_profile = loan_profiles.get((
+                    item.loan.application.client_id,
+                    item.loan.application.product_id))
+                self.handle_response(item,loan_profile,future.result())
+            except Exception as exc:
+                self.handle_error(item,exc)
+
+    def handle_response(self,item,loan_profile,response):
+        r_status = response.get('status')
+
+        if r_status =='created':
+            with transaction.atomic():
+                item.status = PayOutStatusEnum.PROCESSED
+                item.loan.disbursed_on = timezone.now()
+                item.loan.is_disbursed = True
+                item.loan.save()
+                item.notes = 'Queued'
+                item.save()
+                Fund.commit(item.loan.application.product.fund_id,item.amount)
+                loan_profile.available_limit -= item.loan.application.amount
+                loan_profile.save()
+                helpers.create_transaction(
+                client=item.loan.application.client,
+                type = TransactionTypeEnum.DEBIT,
+                product=item.loan.application.product,
+                subject='Loan Disbursement',
+                initial_balance = loan_profile.available_limit,
+                amount = item.loan.application.amount,
+                ref=item.loan)
+        else:
+            item.status = PayOutStatusEnum.ERRORED
+            item.notes = response.get('error') or response.get('status')
+            item.save()
+            Fund.release(item.loan.application.product.fund_id,item.amount)
+            logger.error(f"{response.get('status')}")
+
+    def handle_error(self,item,exc):
+        logger.error(f'{repr(exc)}')
+        if isinstance(exc,RETRYABLE_ERRORS):
+            #the reference number is resent as is, so the endpoint can
+            #recognise a payout whose earlier response was lost
+            timed_out = not isinstance(exc,requests.exceptions.HTTPError)
+            if item.retry("Disbursement Timed Out" if timed_out else "Disbursement Endpoint Unavailable"):
+                item.save()
+                return
+        else:
+            item.notes = "Error on Disbursement"
+            item.status = PayOutStatusEnum.ERRORED
+        item.save()
+        #the reservation is kept while the payout is still being retried
+        Fund.release(item.loan.application.product.fund_id,item.amount)
+
+
+@register
+class CheckoutsWorker(Worker):
+    """Sends M-Pesa STK push requests for pending checkouts."""
+
+    queue = notify.CHECKOUTS
+
+    concurrency = 10
+
+    item_timeout = 2 * HTTP_TIMEOUT
+
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.session = get_http_session(self.concurrency)
+
+    def fetch(self,limit):
+        return list(self.claim(Checkout,limit))
+
+    def get_payload(self,item):
+        return {
+            "BusinessShortCode": settings.VARIABLES.get('BUSINESS_SHORTCODE'),
+            "Password": settings.VARIABLES.get('PASSWORD'),
+            "Timestamp": settings.VARIABLES.get('Timestamp'),
+            "TransactionType": "CustomerPayBillOnline",
+            "Amount": int(item.amount),
+            "PartyA": item.msisdn,
+            "PartyB": settings.VARIABLES.get('BUSINESS_SHORTCODE'),
+            "PhoneNumber": item.msisdn,
+            "CallBackURL": settings.VARIABLES.get('DEFAULTCALLBACKURL'),
+            "AccountReference":item.ref_no,
+            "TransactionDesc": 'Jijenge Loans'
+        }
+
+    def process(self,checkouts):
+        url = settings.VARIABLES.get('PAY_URL')
+        for item in checkouts:
+            item.release() #cleared by whichever save() records the outcome
+        try:
+            headers={"Authorization":"Bearer %s" % helpers.generate_token()}
+        except Exception as exc:
+            #nothing was sent; the whole batch goes again once a token can be had
+            logger.error(f'{repr(exc)}')
+            for item in checkouts:
+                item.retry('Token Unavailable')
+                item.save()
+            return
+        send = lambda item: post(self.session,url,headers,self.get_payload(item))
+
+        for item,future in self.submit(checkouts,send):
+            try:
+                response = future.result()
+                logger.debug(response.text)
+                if response.status_code == requests.codes.unauthorized:
+                    mpesa_token.clear() #stale token, the retry fetches a new one
+                    item.retry('Unauthorized')
+                    item.save()
+                    continue
+                if response.status_code >= 500:
+                    response.raise_for_status()
+                response.json()
+                if response.status_code == requests.codes.ok:
+                    item.status = CheckOutStatusEnum.PROCESSED
+                    item.notes = 'Processed'
+                    item.save()
+                else:
+                    item.status = CheckOutStatusEnum.ERRORED
+                    item.notes = 'Errored'
+                    item.save()
+
+            except RETRYABLE_ERRORS as exc:
+                item.retry("Checkout Timed Out")
+                item.save()
+                logger.error(f'{repr(exc)}')
+
+            except Exception as exc:
+                item.notes = "Error on Checkout"
+                item.status = CheckOutStatusEnum.ERRORED
+                item.save()
+                logger.error(f'{repr(exc)}')
+
+
+@register
+class PayinsWorker(Worker):
+    """Applies received repayments to their loans."""
+
+    queue = notify.PAYINS
+
+    def fetch(self,limit):
+        #posting.post() locks the batch before posting it
+        return posting.get_batch(limit)
+
+    def process(self,payins):
+        posting.process(payins)
+
+
+@register
+class CallbacksWorker(Worker):
+    """Applies the gateway callbacks staged by the IPN views."""
+
+    queue = notify.CALLBACKS
+
+    batch_size = 200
+
+    def fetch(self,limit):
+        #callbacks.apply() locks the batch before applying it
+        return list(Callback.get_unprocessed(limit))
+
+    def process(self,batch):
+        callbacks.process(batch)
@@ -0,0 +1,109 @@
+import time
+from collections import namedtuple
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from .models import Product
+
+VERSION_KEY = 'products:pricing:version'
+
+#how long a process trusts its catalogue before re-reading the version
+CHECK_INTERVAL = 1
+
+
+class Pricing(namedtuple('_Pricing','product_id interest_rate max_repayment_months charges charges_total')):
+    """What a product charges. `charges` holds the (name, amount) of each
+    active charge."""
+    __slots__ = ()
+
+
+class Quote(namedtuple('_Quote','amount charges interest total')):
+    __slots__ = ()
+
+
+def get_interest(amount,interest_rate,months):
+    return (amount*interest_rate*months)//100
+
+
+def quote(pricing,amount,months):
+    """Price a loan of `amount` over `months`. Pure, no queries."""
+    interest = get_interest(amount,pricing.interest_rate,months)
+    return Quote(amount,pricing.charges_total,interest,amount+pricing.charges_total+interest)
+
+
+class Catalogue:
+    """The pricing of every product, held in process memory.
+
+    A change to a product or charge bumps a version number kept in the
+    cache (redis), and each process reloads its catalogue when it sees the
+    version move, so they all drop stale prices within CHECK_INTERVAL.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.pricing = {}
+        self.checked = 0
+
+    def load(self):
+        pricing = {}
+        for product in Product.all_objects.prefetch_related('charges'):
+            charges = tuple((c.name,c.amount) for c in product.charges.all() if c.is_active)
+            pricing[product.pk] = Pricing(
+                product.pk,
+                product.interest_rate,
+                product.max_repayment_months,
+                charges,
+                sum((amount for _,amount in charges),Decimal(0)))
+        return pricing
+
+    def refresh(self):
+        now = time.monotonic()
+        if now - self.checked < CHECK_INTERVAL:
+            return
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            #first process up, or the cache was flushed
+            cache.add(VERSION_KEY,new_version(),None)
+            version = cache.get(VERSION_KEY)
+        if version != self.version:
+            self.pricing = self.load()
+            self.version = version
+        self.checked = now
+
+    def get(self,product_id):
+        self.refresh()
+        try:
+            return self.pricing[product_id]
+        except KeyError:
+            #created since the last load
+            self.checked = 0
+            self.version = None
+            self.refresh()
+            return self.pricing[product_id]
+
+
+catalogue = Catalogue()
+
+
+def get_pricing(product):
+    """The `Pricing` of a product or product id."""
+    return catalogue.get(getattr(product,'pk',product))
+
+
+def get_quote(product,amount,months):
+    return quote(get_pricing(product),amount,months)
+
+
+def new_version():
+    #never one a process could still hold from before a cache flush
+    return int(time.time()*1000)
+
+
+def invalidate():
+    """Bump the catalogue version once the current transaction commits."""
+    def bump():
+        try:
+            cache.incr(VERSION_KEY)
+        except ValueError:
+            cache.set(VERSION_KEY,new_version(),None)
+    transaction.on_commit(bump)
@@ -0,0 +1,19 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from charges.models import Charge
+from .models import Product
+from . import pricing
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Charge)
+@receiver(post_delete, sender=Charge)
+def _invalidate_pricing(sender, **kw):
+    pricing.invalidate()
+
+
+@receiver(m2m_changed, sender=Product.charges.through)
+def _invalidate_product_charges(sender, action=None, **kw):
+    if action in ('post_add','post_remove','post_clear'):
+        pricing.invalidate()
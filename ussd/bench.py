@@ -0,0 +1,254 @@
+import time
+import uuid
+import pickle
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client as HttpClient
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from flex.ussd.bench import benchmark, measure
+from flex.ussd.backends import ussd_session_backend, RedisHashBackend
+from flex.ussd.codecs import JsonSessionCodec
+from flex.ussd.screens import ScreenState, get_screen
+from flex.ussd.sessions import UssdSession, UssdSessionKey, HistoryPath
+from flex.ussd.utils import ArgumentVector, parse_argv
+
+from charges.models import Charge
+from clients.models import Client, LoanProfile
+from funds.models import Fund
+from loans.models import Application, ApplicationStatusEnum, Loan
+from organisations.models import Organisation, Center
+from products.models import Product
+from users.models import User
+
+
+def make_session():
+	"""A session as it stands on the loan confirmation screen."""
+	product = Product(pk=3, name='Jijenge Biashara', slug='jijenge-biashara', short_name='JB',
+		description='Business loans', minimum_principal=Decimal('500.00'),
+		maximum_principal=Decimal('50000.00'), interest_rate=Decimal('10.00'),
+		max_repayment_months=3, fund_id=1)
+	client = Client(pk=1042, msisdn='+254700000001', first_name='Wanjiru', last_name='Kamau',
+		id_no=12345678, is_active=True, officer_id=7, center_id=2)
+	profile = LoanProfile(pk=1187, product=product, client=client, loan_limit=Decimal('5000.00'),
+		available_limit=Decimal('5000.00'), minimum_principle=Decimal('500.00'))
+
+	session = UssdSession(UssdSessionKey('254700000001', 'ATUid_8c1f0e3a9b2d'))
+	session.created_at = session.accessed_at = datetime.datetime.now()
+	session.argv = ArgumentVector('*483', '1*2*3000*1')
+	session.country_code = 'KE'
+	session.client = client
+	session._history_stack = [HistoryPath(p) for p in ('/a1', '/a1/b2', '/a1/b2/c3', '/a1/b2/c3/d4')]
+	session.state = make_state(get_screen('jl.loan_confirmation').state_class, product, profile)
+	return session
+
+
+def make_state(cls, product, profile):
+	return cls('jl.loan_confirmation', product=product, loan_profile=profile,
+		amount=3000, period=1, _action='CON', _current_page=0, _pages=[0], _body=None)
+
+
+@benchmark
+def session_codec(number=1000):
+	session = make_session()
+	codec = JsonSessionCodec(UssdSession)
+
+	# what the cache backend stores and reads back on every hop
+	variants = dict(
+		pickle=(lambda: pickle.dumps(session, -1), pickle.loads),
+		json=(lambda: pickle.dumps(codec.dumps(session), -1), lambda b: codec.loads(pickle.loads(b))),
+	)
+	rows = []
+	for name, (dumps, loads) in variants.items():
+		data = dumps()
+		rows.append(dict(
+			codec=name,
+			bytes=len(data),
+			save_us=measure(dumps, number=number),
+			load_us=measure(loads, data, number=number),
+		))
+	for row in rows:
+		row['per_hop_us'] = round(row['save_us'] + row['load_us'], 2)
+	return rows
+
+
+@benchmark
+def screen_state(number=1000):
+	session = make_session()
+	codec = JsonSessionCodec(UssdSession)
+	product, profile = session.state.product, session.state.loan_profile
+
+	rows = []
+	for name, cls in (('bag', ScreenState), ('slotted', get_screen('jl.loan_confirmation').state_class)):
+		state = make_state(cls, product, profile)
+		del state._body
+		pickled = pickle.dumps(state, -1)
+		rows.append(dict(
+			state=name,
+			pickle_bytes=len(pickled),
+			json_bytes=len(codec.dumps_value(state)),
+			create_us=measure(make_state, cls, product, profile, number=number),
+			get_us=measure(lambda: state.amount, number=number),
+			get_missing_us=measure(state.get, '_body', number=number),
+			set_us=measure(setattr, state, 'period', 2, number=number),
+			pickle_us=measure(pickle.dumps, state, -1, number=number),
+			unpickle_us=measure(pickle.loads, pickled, number=number),
+		))
+	return rows
+
+
+@benchmark
+def argv(number=1000):
+	# the ussd strings of a long session, one per hop, paging and going back on the way
+	inputs = ['1', '2', '98', '98', '0', '3', '"Jane Doe"', '1000', '0', '2000', '1'] * 3
+	argstrs = ['*'.join(inputs[:i]) for i in range(len(inputs) + 1)]
+
+	def full():
+		xargv = None
+		for argstr in argstrs:
+			argv = ArgumentVector('*483', argstr)
+			if xargv:
+				argv - xargv
+			xargv = argv
+
+	def incremental():
+		xargv = xargstr = None
+		for argstr in argstrs:
+			xargv, _ = parse_argv('*483', argstr, None, xargv, xargstr)
+			xargstr = argstr
+
+	return [
+		dict(parser=name, hops=len(argstrs), per_session_us=measure(func, number=max(number//10, 1)))
+		for name, func in (('full', full), ('incremental', incremental))
+	]
+
+
+# the inputs a gateway sends, one per hop, through each journey
+JOURNEYS = dict(
+	borrow=('', '1', '1', '1000', '1'), # home -> products -> amount -> period -> confirm
+	repay=('', '2', '1', '1'), # home -> my loans -> loan details -> pay
+)
+
+
+def make_clients(count):
+	"""`count` active clients with a loan profile and a disbursed loan each."""
+	tag = uuid.uuid4().hex[:8]
+	user = User.objects.create(msisdn='bench-%s' % tag, first_name='Bench', last_name='Officer')
+	org = Organisation.objects.create(name='bench-%s' % tag, contact_email='bench@example.com',
+		address='-', manager=user)
+	center = Center.objects.create(name='bench-%s' % tag, contact_email='bench@example.com',
+		address='-', manager=user, organisation=org)
+	fund = Fund.objects.create(name='bench-%s' % tag, description='-', balance=10**6)
+	product = Product.objects.create(name='Jijenge Biashara', short_name='JB',
+		minimum_principal=100, maximum_principal=10000, interest_rate=Decimal('10'),
+		max_repayment_months=3, fund=fund)
+	product.charges.add(Charge.objects.create(name='bench-%s' % tag, amount=50))
+
+	msisdns = ['+2547%08d' % n for n in range(count)]
+	Client.objects.bulk_create([Client(msisdn=m, first_name='Client', last_name='%d' % n,
+		id_no=n, is_active=True, officer=user, center=center) for n, m in enumerate(msisdns)])
+	clients = list(Client.objects.filter(center=center).order_by('id'))
+	Client.products.through.objects.bulk_create([
+		Client.products.through(client=c, product=product) for c in clients])
+	LoanProfile.objects.bulk_create([LoanProfile(client=c, product=product, loan_limit=5000,
+		available_limit=4000, minimum_principle=100, is_active=True) for c in clients])
+
+	base = int(time.time() * 1000) * 1000
+	Application.objects.bulk_create([Application(client=c, product=product, amount=1000,
+		status=ApplicationStatusEnum.PROCESSED, duration=1, code=base + i)
+		for i, c in enumerate(clients)])
+	applications = Application.objects.filter(product=product).order_by('id')
+	Loan.objects.bulk_create([Loan(application=a, amount=1150, date_due=timezone.now(),
+		is_disbursed=True, disbursed_on=timezone.now()) for a in applications])
+	return [str(c.msisdn).lstrip('+') for c in clients]
+
+
+def get_stand_in_caches():
+	"""The configured redis cache, on an in-memory fakeredis server if it
+	is installed. Other cache backends are used as they are."""
+	conf = settings.CACHES['default']
+	if 'django_redis' not in conf['BACKEND']:
+		return None
+	try:
+		import fakeredis
+	except ImportError:
+		return None
+	options = dict(conf.get('OPTIONS', {}), CONNECTION_POOL_KWARGS=dict(
+		connection_class=fakeredis.FakeConnection, server=fakeredis.FakeServer()))
+	#a LOCATION of its own, django_redis keeps its pools by url
+	return dict(settings.CACHES, default=dict(conf, LOCATION='redis://ussdbench/0', OPTIONS=options))
+
+
+def get_stored_bytes(msisdn):
+	backend = ussd_session_backend
+	key = backend.get_session_key_class(None)(uid=msisdn, sid=None)
+	if isinstance(backend._wrapped, RedisHashBackend):
+		fields = backend.get_redis().hgetall(backend.get_session_cache_key(key))
+		return sum(len(k) + len(v) for k, v in fields.items())
+	data = ussd_session_backend.get_saved_session(key, None)
+	return len(backend.codec.dumps(data)) if data is not None else 0
+
+
+def percentile(values, p):
+	values = sorted(values)
+	return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def run_journey(http, msisdn, session_id, inputs):
+	hops = []
+	ussd_string = ''
+	for value in inputs:
+		if value:
+			ussd_string = ('%s*%s' % (ussd_string, value)).strip('*')
+		params = dict(service_code='*483', ussd_string=ussd_string, msisdn=msisdn, session_id=session_id)
+		with CaptureQueriesContext(connection) as queries:
+			start = time.perf_counter()
+			response = http.get('/ussd/', params)
+			elapsed = time.perf_counter() - start
+		if response.status_code != 200:
+			raise RuntimeError('Journey failed at "%s": %s' % (ussd_string, response.status_code))
+		hops.append((elapsed * 1000, len(queries)))
+	return hops
+
+
+@benchmark
+def journeys(number=1000):
+	"""Replays synthetic gateway sessions through the Safaricom view.
+
+	`number` / 10 sessions run per journey, each with a msisdn of its own.
+	Everything is written in a transaction that is rolled back at the end.
+	"""
+	sessions = max(number // 10, 1)
+	caches = get_stand_in_caches()
+	overrides = dict(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver'])
+	if caches:
+		overrides['CACHES'] = caches
+
+	rows = []
+	with override_settings(**overrides), transaction.atomic():
+		msisdns = make_clients(sessions * len(JOURNEYS))
+		http = HttpClient()
+		for n, (name, inputs) in enumerate(JOURNEYS.items()):
+			hops, stored = [], []
+			for msisdn in msisdns[n * sessions:(n + 1) * sessions]:
+				hops.extend(run_journey(http, msisdn, uuid.uuid4().hex, inputs))
+				stored.append(get_stored_bytes(msisdn))
+			latencies = [h[0] for h in hops]
+			queries = [h[1] for h in hops]
+			rows.append(dict(
+				journey=name,
+				sessions=sessions,
+				hops=len(hops),
+				p50_ms=round(percentile(latencies, 50), 2),
+				p95_ms=round(percentile(latencies, 95), 2),
+				p99_ms=round(percentile(latencies, 99), 2),
+				queries_per_hop=round(sum(queries) / len(queries), 2),
+				max_queries=max(queries),
+				bytes_per_session=round(sum(stored) / len(stored)),
+			))
+		transaction.set_rollback(True)
+	return rows
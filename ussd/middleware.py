@@ -1,18 +1,12 @@
 import re
 import json
-import requests
+from asgiref.sync import sync_to_async
 from ipware import get_client_ip
 from django.conf import settings
-from django.http import HttpResponse
-from requests.exceptions import Timeout as RequestTimeout
 
-from flex.ussd.middleware import UssdMiddleware
+from flex.ussd.middleware import UssdMiddleware, AsyncUssdMiddleware
 
-try:
-	import simplejson
-	JSONDecodeErrors = (json.JSONDecodeError, simplejson.JSONDecodeError)
-except ImportError:
-	JSONDecodeErrors = (json.JSONDecodeError,)
+from .models import PushBack
 
 
 class KenyaSafaricomUssdMiddleware(UssdMiddleware):
@@ -73,37 +67,42 @@ class GhanaMtnUssdMiddleware(UssdMiddleware):
 				rv['request_inputs'] = rv['user_request']
 		return rv
 
-	def teardown_request(self, req, res):
-		res = super().teardown_request(req, res) or res
+	def get_push_payload(self, req, res):
 		res_type, body = res.content.decode('utf-8').split(' ',1)
 		res.content = body
-
-		url = '%s/api/ussdclientresponse' % (self.api_url,)
-		payload = dict(
+		data = getattr(req, 'ussd_data', None) or self.extract_request_data(req)
+		return dict(
 			service_token=self.api_service_token,
-			ussd_code='*%s' % (req.ussd_data['service_code']),
-			phone_number=req.ussd_data['phone_number'],
-			message=res.content,
+			ussd_code='*%s' % (data['service_code']),
+			phone_number=data['phone_number'],
+			message=body,
 			type=res_type
 		)
 
-		rv = False
-		for con_timeout in (4, 6, 8, 8):
-			try:
-				r = requests.post(url, json=payload, timeout=(con_timeout, 16))
-			except RequestTimeout:
-				continue
-			else:
-				if r.status_code == 200:
-					try:
-						rj = r.json()
-					except JSONDecodeErrors:
-						continue
-					else:
-						rv = isinstance(rj, dict) and rj.get('status_code:') == 200
-						if rv:
-							break
-		return res if rv else HttpResponse('Error %s' % (r.text if r and settings.DEBUG else ''))
+	def get_push_url(self):
+		return '%s/api/ussdclientresponse' % (self.api_url,)
+
+	def enqueue_push(self, req, res):
+		#delivered by the pushbacks worker, so the gateway isn't kept waiting
+		payload = self.get_push_payload(req, res)
+		PushBack.enqueue(PushBack.make_key(req.ussd_session), self.get_push_url(), payload)
+		return res
+
+	def teardown_request(self, req, res):
+		return self.enqueue_push(req, res)
+
+
+
+class AsyncKenyaSafaricomUssdMiddleware(AsyncUssdMiddleware, KenyaSafaricomUssdMiddleware):
+	"""KenyaSafaricomUssdMiddleware for `AsyncUssdView`s."""
+
+
+
+class AsyncGhanaMtnUssdMiddleware(AsyncUssdMiddleware, GhanaMtnUssdMiddleware):
+	"""GhanaMtnUssdMiddleware for `AsyncUssdView`s."""
+
+	async def ateardown_request(self, req, res):
+		return await sync_to_async(self.enqueue_push)(req, res)
 
 
 
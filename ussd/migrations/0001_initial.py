@@ -0,0 +1,37 @@
+# Generated by Django 3.2.4 on 2026-10-18 19:59
+
+from django.db import migrations, models
+import django.utils.timezone
+import django_enumfield.db.fields
+import ussd.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushBack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('url', models.CharField(max_length=255)),
+                ('payload', models.JSONField()),
+                ('status', django_enumfield.db.fields.EnumField(default=0, enum=ussd.models.PushBackStatusEnum)),
+                ('notes', models.CharField(blank=True, max_length=255, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pushback',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True), ('status', ussd.models.PushBackStatusEnum(0))), fields=['next_attempt_at', 'id'], name='ussd_pushback_queue_idx'),
+        ),
+    ]
@@ -1,5 +1,14 @@
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django_enumfield import enum
 from flex.ussd.utils import AttributeBag
 from clients.models import Client
+from factory.models import FactoryModel, RetryModel
+from factory import notify
+from .pushback import CONNECT_TIMEOUTS
 
 class UserAccount(AttributeBag):
 	
@@ -8,4 +17,63 @@ class UserAccount(AttributeBag):
     msisdn = None
     account_no = None
 
-   
\ No newline at end of file
+   
+
+class PushBackStatusEnum(enum.Enum):
+
+    PENDING = 0
+    DELIVERED = 1
+    ERRORED = 2
+    DEAD = 3 #retries exhausted or the session expired
+    __default__ = PENDING
+
+
+class PushBack(FactoryModel, RetryModel):
+    """A screen waiting to be pushed back to a gateway that doesn't take it
+    in the response, delivered by the pushbacks worker."""
+
+    key = models.CharField(max_length=64, unique=True)
+    url = models.CharField(max_length=255)
+    payload = models.JSONField()
+    status = enum.EnumField(PushBackStatusEnum)
+    notes = models.CharField(max_length=255, null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            #the pushbacks worker's queue, see get_unprocessed
+            models.Index(fields=['next_attempt_at', 'id'], name='ussd_pushback_queue_idx',
+                condition=models.Q(status=PushBackStatusEnum.PENDING, deleted_at__isnull=True)),
+        ]
+
+    @staticmethod
+    def make_key(session):
+        #one push per session hop; a resent request of the same hop has the same argv
+        key = '%s:%s:%s' % (session.key.uid, session.key.sid, session.argv)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    @classmethod
+    def enqueue(cls, key, url, payload):
+        """Queue a push; a second one with the same `key` is dropped."""
+        cls.objects.bulk_create([cls(key=key, url=url, payload=payload)], ignore_conflicts=True)
+        notify.notify(notify.PUSHBACKS)
+
+    @classmethod
+    def get_unprocessed(cls, limit):
+        return cls.due().order_by('next_attempt_at', 'id')[:limit]
+
+    def get_max_attempts(self):
+        return len(CONNECT_TIMEOUTS)
+
+    @staticmethod
+    def get_backoff(attempts):
+        #the subscriber is still waiting on the screen, so retries can't wait long
+        return min(2 ** (attempts - 1), 4)
+
+    @property
+    def connect_timeout(self):
+        return CONNECT_TIMEOUTS[min(self.attempts, len(CONNECT_TIMEOUTS) - 1)]
+
+    @property
+    def is_expired(self):
+        return timezone.now() - self.created_at > timedelta(seconds=settings.USSD_PUSHBACK_TTL)
@@ -0,0 +1,58 @@
+"""Pushes screens back to gateways that don't take them in the response,
+like MTN Ghana's.
+
+The middleware only queues a `PushBack` per session hop; the pushbacks
+worker (see `ussd.workers`) posts them on a pooled session, retrying with
+a longer connect timeout on every attempt.
+"""
+import json
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+#connect timeout of each attempt, the read timeout is READ_TIMEOUT
+CONNECT_TIMEOUTS = (4, 6, 8, 8)
+
+READ_TIMEOUT = 16
+
+#failures worth another attempt; a rejected push is retried as well
+RETRYABLE_ERRORS = (
+	requests.exceptions.Timeout,
+	requests.exceptions.ConnectionError,
+)
+
+
+class PushResult(object):
+
+	__slots__ = 'ok', 'status_code', 'text'
+
+	def __init__(self, ok, status_code=None, text=''):
+		self.ok = ok
+		self.status_code = status_code
+		self.text = text
+
+
+def is_accepted(status_code, data):
+	#the gateway's own spelling of the key
+	return status_code == 200 and isinstance(data, dict) and data.get('status_code:') == 200
+
+
+def get_http_session(pool_size):
+	#one keep-alive pool shared by all in-flight pushes of a worker
+	session = requests.Session()
+	adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+	session.mount('https://', adapter)
+	session.mount('http://', adapter)
+	return session
+
+
+def push(session, url, payload, connect_timeout):
+	"""Post `payload` once. Raises one of RETRYABLE_ERRORS on a timeout."""
+	r = session.post(url, json=payload, timeout=(connect_timeout, READ_TIMEOUT))
+	try:
+		data = json.loads(r.text)
+	except ValueError:
+		data = None
+	return PushResult(is_accepted(r.status_code, data), r.status_code, r.text)
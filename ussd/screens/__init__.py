@@ -7,7 +7,6 @@ from django.conf import settings
 
 from . import loan,account
 from .mixins import ScreenMixin
-from clients.models import Client
 # from .helpers import Fetcher
 # fetcher = Fetcher()
 
@@ -17,20 +16,17 @@ class InitialScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'initial'
+		state = ()
 
 	def render(self, opt=None, *args):
 		if self.is_client():
-			phone_field = self.msisdn_to_phonefield()
-			client = Client.objects.get(msisdn=phone_field)
-			self.session.client = client
+			self.session.client = self.client_profile.client
 			return render_screen('jl.home')
 		else:
 			return render_screen('jl.unknownmous_user')
 
 	def is_client(self):
-		phone_field = self.msisdn_to_phonefield()
-		
-		return Client.objects.filter(is_active=True,msisdn=phone_field).exists()
+		return self.client_profile is not None
 			
 
 
@@ -46,6 +42,7 @@ class HomeScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'home'
+		state = ()
 
 
 	def handle_input(self, *args):
@@ -58,7 +55,7 @@ class HomeScreen(UssdScreen, ScreenMixin):
 		return render_screen(opt[1])
 
 	def render_menu(self):
-		self.print(f"{self.time_salutation()} {self.session.client.first_name}, Welcome to {settings.BRAND_NAME}")
+		self.print(f"{self.time_salutation()} {self.client_profile.client.first_name}, Welcome to {settings.BRAND_NAME}")
 		for k, v in self.MENU_ITEMS.items():
 			self.print(str(k) + ':',v[0])
 		return self.CON
@@ -4,8 +4,6 @@ from django.utils.timezone import is_aware
 from flex.ussd.screens import UssdScreen, render_screen
 from .mixins import ScreenMixin
 from django.conf import settings
-from products.models import Product
-from clients.models import LoanProfile
 from .utils import fetcher
 from factory.helpers import helpers
 
@@ -21,6 +19,7 @@ class MyAccountHomeScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'my_account_home'
+		state = ()
 
 
 	def handle_input(self, *args):
@@ -54,6 +53,7 @@ class LoanBalanceHomeScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_balance_home'
+		state = ('menu',)
 
 
 	def handle_input(self, *args):
@@ -62,7 +62,7 @@ class LoanBalanceHomeScreen(UssdScreen, ScreenMixin):
 			return self.render_menu()
 
 		opt = self.state.menu[args[0]]
-		product = Product.objects.get(pk=opt[1])
+		product = self.client_profile.get_product(opt[1])
 		
 		return render_screen('jl.loan_balance',product=product)
 	
@@ -74,18 +74,7 @@ class LoanBalanceHomeScreen(UssdScreen, ScreenMixin):
 		return self.CON
 		
 	def get_menu(self):
-		menu = fetcher.fetch_products_menu(
-			self.session.client.products.filter(
-				is_active=True
-				).order_by(
-					'id'
-				).values_list(
-						'name',
-						'id',
-			
-				)
-			)
-		self.state.menu = menu
+		self.state.menu = self.get_products_menu()
 		
 	def render(self, opt=None, *args):
 		if opt is not None and not args:
@@ -100,6 +89,7 @@ class LoanLimitHomeScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_limit_home'
+		state = ('menu',)
 
 
 	def handle_input(self, *args):
@@ -108,7 +98,7 @@ class LoanLimitHomeScreen(UssdScreen, ScreenMixin):
 			return self.render_menu()
 
 		opt = self.state.menu[args[0]]
-		product = Product.objects.get(pk=opt[1])
+		product = self.client_profile.get_product(opt[1])
 		
 		return render_screen('jl.loan_limit',product=product)
 	
@@ -120,18 +110,7 @@ class LoanLimitHomeScreen(UssdScreen, ScreenMixin):
 		return self.CON
 		
 	def get_menu(self):
-		menu = fetcher.fetch_products_menu(
-			self.session.client.products.filter(
-				is_active=True
-				).order_by(
-					'id'
-				).values_list(
-						'name',
-						'id',
-			
-				)
-			)
-		self.state.menu = menu
+		self.state.menu = self.get_products_menu()
 		
 	def render(self, opt=None, *args):
 		if opt is not None and not args:
@@ -146,6 +125,7 @@ class LoanBalanceScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_balance'
+		state = ('product',)
 
 
 
@@ -156,7 +136,7 @@ class LoanBalanceScreen(UssdScreen, ScreenMixin):
 		loan_profile = self.get_client_product_loan_profile()
 
 		
-		self.print(f"Your Available Balance for {self.state.product.name} is {loan_profile.available_limit}")
+		self.print(f"Your Available Balance for {loan_profile.product.name} is {loan_profile.available_limit}")
 		
 		return self.END
 
@@ -166,15 +146,13 @@ class LoanBalanceScreen(UssdScreen, ScreenMixin):
 		if args:
 			self.print('Invalid choice.')
 		return self.render_menu()
-	def get_client_product_loan_profile(self):
-		product = self.state.product
-		return LoanProfile.objects.get(product=product,client=self.session.client)
 
 class LoanLimitScreen(UssdScreen, ScreenMixin):
 	nav_menu = None
 
 	class Meta:
 		label = 'loan_limit'
+		state = ('product',)
 
 
 
@@ -185,7 +163,7 @@ class LoanLimitScreen(UssdScreen, ScreenMixin):
 		loan_profile = self.get_client_product_loan_profile()
 
 		
-		self.print(f"Your Loan Limit for {self.state.product.name} is {loan_profile.loan_limit}")
+		self.print(f"Your Loan Limit for {loan_profile.product.name} is {loan_profile.loan_limit}")
 		
 		return self.END
 
@@ -195,15 +173,13 @@ class LoanLimitScreen(UssdScreen, ScreenMixin):
 		if args:
 			self.print('Invalid choice.')
 		return self.render_menu()
-	def get_client_product_loan_profile(self):
-		product = self.state.product
-		return LoanProfile.objects.get(product=product,client=self.session.client)
 
 class MyLoansScreen(UssdScreen, ScreenMixin):
 	
 
 	class Meta:
 		label = 'my_loans'
+		state = ('menu',)
 
 
 
@@ -249,6 +225,7 @@ class LoansDetailsScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_details'
+		state = ('loan',)
 
 
 
@@ -283,6 +260,7 @@ class LoansPayAllScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'pay'
+		state = ('loan',)
 
 
 
@@ -312,6 +290,7 @@ class LoansPartScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'pay_part'
+		state = ('loan',)
 
 
 
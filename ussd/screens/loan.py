@@ -3,8 +3,6 @@ from datetime import timedelta
 from django.utils import timezone
 
 from django.utils.timezone import is_aware
-from products.models import Product
-from clients.models import LoanProfile
 
 from flex.ussd.screens import UssdScreen, render_screen
 from dateutil.relativedelta import relativedelta
@@ -12,6 +10,7 @@ from .mixins import ScreenMixin
 from django.conf import settings
 from .utils import fetcher
 from factory.helpers import helpers
+from products.pricing import get_pricing, get_quote
 
 
 class LoanProductsScreen(UssdScreen, ScreenMixin):
@@ -20,6 +19,7 @@ class LoanProductsScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'products'
+		state = ('menu',)
 
 
 	def handle_input(self, *args):
@@ -28,7 +28,7 @@ class LoanProductsScreen(UssdScreen, ScreenMixin):
 			return self.render_menu()
 
 		opt = self.state.menu[args[0]]
-		product = Product.objects.get(pk=opt[1])
+		product = self.client_profile.get_product(opt[1])
 		
 		return render_screen('jl.loan_amount',product=product)
 	
@@ -40,18 +40,7 @@ class LoanProductsScreen(UssdScreen, ScreenMixin):
 		return self.CON
 		
 	def get_menu(self):
-		menu = fetcher.fetch_products_menu(
-			self.session.client.products.filter(
-				is_active=True
-				).order_by(
-					'id'
-				).values_list(
-						'name',
-						'id',
-			
-				)
-			)
-		self.state.menu = menu
+		self.state.menu = self.get_products_menu()
 		
 	def render(self, opt=None, *args):
 		if opt is not None and not args:
@@ -66,6 +55,7 @@ class LoanAmountScreen(UssdScreen, ScreenMixin):
 	
 	class Meta:
 		label = 'loan_amount'
+		state = ('product',)
 
 
 	def handle_input(self, opt):
@@ -95,9 +85,6 @@ class LoanAmountScreen(UssdScreen, ScreenMixin):
 			self.print('Invalid choice.')
 		return self.render_menu()
 
-	def get_client_product_loan_profile(self):
-		product = self.state.product
-		return LoanProfile.objects.get(product=product,client=self.session.client)
 
 
 class LoanPeriodScreen(UssdScreen, ScreenMixin):
@@ -105,6 +92,7 @@ class LoanPeriodScreen(UssdScreen, ScreenMixin):
 	
 	class Meta:
 		label = 'loan_period'
+		state = ('product', 'loan_profile', 'amount', 'menu')
 
 
 	def handle_input(self, opt):
@@ -135,7 +123,7 @@ class LoanPeriodScreen(UssdScreen, ScreenMixin):
 		return self.render_menu()
 
 	def get_menu(self):
-		menu = fetcher.make_loan_duration_menu(self.state.product.max_repayment_months+1)
+		menu = fetcher.make_loan_duration_menu(get_pricing(self.state.product.pk).max_repayment_months+1)
 		self.state.menu = menu
 
 class LoanCornifirmationScreen(UssdScreen, ScreenMixin):
@@ -149,6 +137,7 @@ class LoanCornifirmationScreen(UssdScreen, ScreenMixin):
 	
 	class Meta:
 		label = 'loan_confirmation'
+		state = ('product', 'loan_profile', 'amount', 'period')
 
 
 	def handle_input(self, *args):
@@ -161,16 +150,13 @@ class LoanCornifirmationScreen(UssdScreen, ScreenMixin):
 		return render_screen(opt[1],product= self.state.product,amount= self.state.amount,period=self.state.period)
 	
 	def render_menu(self):
-		charges = 0
-		for charge in self.state.product.charges.all():
-			charges+= charge.amount
-		interest = self.calculate_interest()
+		quote = get_quote(self.state.product.pk, self.state.amount, self.state.period)
 		due_date = timezone.now() + relativedelta(months=self.state.period)
 		self.print(f'Borrow {self.state.amount} for {self.state.period} Month(s)')
-		self.print(f'Charges {charges}')
-		self.print(f'Interest {interest}')
+		self.print(f'Charges {quote.charges}')
+		self.print(f'Interest {quote.interest}')
 		self.print(f'Due On {self.format_date(due_date)}')
-		self.print(f'Total Loan {self.state.amount + charges+interest}')
+		self.print(f'Total Loan {quote.total}')
 		for k, v in self.MENU_ITEMS.items():
 			self.print(str(k) + ':',v[0])
 		return self.CON
@@ -183,10 +169,6 @@ class LoanCornifirmationScreen(UssdScreen, ScreenMixin):
 			self.print('Invalid choice.')
 		return self.render_menu()
 
-	def calculate_interest(self):
-		interest = (self.state.amount*self.state.product.interest_rate*self.state.period)//100
-		return interest
-
 
 class LoanProductInfoScreen(UssdScreen, ScreenMixin):
 
@@ -204,12 +186,12 @@ class LoanProductInfoScreen(UssdScreen, ScreenMixin):
 		pass
 	
 	def render_menu(self):
-		product = self.state.product
+		pricing = get_pricing(self.state.product.pk)
 		# self.print(f'Name: {product.name}')
-		self.print(f'Interest Rate(PM): {product.interest_rate}%')
+		self.print(f'Interest Rate(PM): {pricing.interest_rate}%')
 		self.print('Charges:')
-		for charge in product.charges.filter(is_active=True):
-			self.print(f'{charge.name} - {charge.amount} (KES) ')
+		for name, amount in pricing.charges:
+			self.print(f'{name} - {amount} (KES) ')
 		
 		for k, v in self.MENU_ITEMS.items():
 			self.print(str(k) + ':',v[0])
@@ -227,6 +209,7 @@ class LoanCompleteScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_complete'
+		state = ('product', 'amount', 'period')
 
 
 
@@ -254,6 +237,7 @@ class LoanCancelScreen(UssdScreen, ScreenMixin):
 
 	class Meta:
 		label = 'loan_cancel'
+		state = ('product', 'amount', 'period')
 
 
 
@@ -7,6 +7,8 @@ from phonenumber_field.phonenumber import to_python
 from django.utils import timezone
 
 from django.conf import settings
+from clients.cache import get_client_profile
+from .utils import fetcher
 
 
 
@@ -32,6 +34,16 @@ class ScreenMixin(object):
 	def msisdn_to_phonefield(self):
 		return to_python(self.session.msisdn)
 
+	@cached_property
+	def client_profile(self):
+		return get_client_profile(self.msisdn_to_phonefield())
+
+	def get_client_product_loan_profile(self):
+		return self.client_profile.get_loan_profile(self.state.product.pk)
+
+	def get_products_menu(self):
+		return fetcher.fetch_products_menu(self.client_profile.get_products_menu())
+
 class RestoreSessionMixin(object):
 
 	restore_session_message = 'Your previous session is still active.'
@@ -0,0 +1,109 @@
+import json
+import pickle
+import datetime
+from collections import namedtuple
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from factory.testing import LoanFixturesMixin
+from flex.ussd.codecs import JsonSessionCodec, ModelRef
+from flex.ussd.sessions import UssdSession
+from flex.ussd.utils import ArgumentVector
+
+from .bench import make_session
+
+# Create your tests here.
+
+
+Point = namedtuple('Point', 'x y')
+
+
+class JsonSessionCodecTests(SimpleTestCase):
+
+	def setUp(self):
+		self.codec = JsonSessionCodec(UssdSession)
+
+	def roundtrip(self, value):
+		return self.codec.loads_value(self.codec.dumps_value(value))
+
+	def test_a_session_survives_a_roundtrip(self):
+		session = make_session()
+		rv = self.codec.loads(self.codec.dumps(session))
+
+		self.assertIsInstance(rv, UssdSession)
+		self.assertEqual(rv.key, session.key)
+		self.assertEqual(type(rv.key), type(session.key))
+		self.assertEqual(rv.argv, session.argv)
+		self.assertIsInstance(rv.argv, ArgumentVector)
+		self.assertEqual(rv.history.stack, session.history.stack)
+		self.assertEqual(rv.created_at, session.created_at)
+		self.assertIs(type(rv.state), type(session.state))
+		self.assertEqual(rv.state.screen, 'jl.loan_confirmation')
+		self.assertEqual(rv.state.amount, 3000)
+		self.assertEqual(self.codec.dumps(rv), self.codec.dumps(session))
+
+	def test_model_instances_come_back_as_unloaded_refs(self):
+		rv = self.codec.loads(self.codec.dumps(make_session()))
+		product = rv.state.product
+		self.assertIs(type(product), ModelRef)
+		self.assertFalse(product.is_loaded)
+		self.assertEqual(product.pk, 3)
+		self.assertFalse(product.is_loaded)
+
+	def test_values_keep_their_types(self):
+		values = [
+			(1, 'a', None),
+			Decimal('10.50'),
+			datetime.datetime(2026, 10, 18, 9, 30),
+			datetime.date(2026, 10, 18),
+			ArgumentVector('*483', '1*2'),
+			Point(1, 2),
+		]
+		for value in values:
+			rv = self.roundtrip(value)
+			self.assertEqual(rv, value)
+			self.assertIs(type(rv), type(value))
+
+	def test_dicts_with_the_tag_key_or_other_keys_survive(self):
+		self.assertEqual(self.roundtrip({'~': 1, 'v': 2}), {'~': 1, 'v': 2})
+		self.assertEqual(self.roundtrip({2: 'x', 'a': [1]}), {2: 'x', 'a': [1]})
+
+	def test_other_values_fall_back_to_pickle(self):
+		self.assertEqual(self.roundtrip({1, 2}), {1, 2})
+
+	def test_data_of_another_version_is_dropped(self):
+		data = json.loads(self.codec.dumps(make_session()))
+		data['v'] = JsonSessionCodec.VERSION + 1
+		self.assertIsNone(self.codec.loads(json.dumps(data)))
+
+
+class ModelRefTests(LoanFixturesMixin, TestCase):
+
+	def setUp(self):
+		cache.clear()
+		self.product = self.create_product()
+		self.codec = JsonSessionCodec(UssdSession)
+
+	def test_a_ref_is_fetched_on_first_use_only(self):
+		ref = self.codec.loads_value(self.codec.dumps_value(self.product))
+		with self.assertNumQueries(0):
+			self.assertEqual(ref.pk, self.product.pk)
+		with self.assertNumQueries(1):
+			self.assertEqual(ref.name, self.product.name)
+		with self.assertNumQueries(0):
+			self.assertEqual(ref.fund_id, self.product.fund_id)
+
+	def test_a_ref_is_encoded_without_being_fetched(self):
+		ref = ModelRef('products.product', self.product.pk)
+		with self.assertNumQueries(0):
+			data = self.codec.dumps_value(ref)
+			rv = pickle.loads(pickle.dumps(ref))
+		self.assertFalse(ref.is_loaded)
+		self.assertEqual(self.codec.loads_value(data).pk, self.product.pk)
+		self.assertEqual(rv.name, self.product.name)
+
+	def test_a_deleted_instance_is_still_found(self):
+		self.product.delete()
+		ref = self.codec.loads_value(self.codec.dumps_value(self.product))
+		self.assertEqual(ref.name, self.product.name)
@@ -1,9 +1,10 @@
 
 from django.conf.urls import url
 from django.urls import path,include
-from .views import KenyaSafaricomUssdView, GhanaMtnUssdView
+from .views import KenyaSafaricomUssdView, GhanaMtnUssdView, AsyncKenyaSafaricomUssdView
 
 
 urlpatterns=[
 	path('', KenyaSafaricomUssdView.as_view(), name='ke_saf_ussd'),
+	path('async/', AsyncKenyaSafaricomUssdView.as_view(), name='ke_saf_ussd_async'),
 ]
\ No newline at end of file
@@ -1,10 +1,11 @@
 from django.shortcuts import render
-from flex.ussd.views import UssdView
+from flex.ussd.views import UssdView, AsyncUssdView
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
 # Create your views here.
-from .middleware import KenyaSafaricomUssdMiddleware, GhanaMtnUssdMiddleware
+from .middleware import KenyaSafaricomUssdMiddleware, GhanaMtnUssdMiddleware, \
+	AsyncKenyaSafaricomUssdMiddleware, AsyncGhanaMtnUssdMiddleware
 
 
 @method_decorator(KenyaSafaricomUssdMiddleware, 'dispatch')
@@ -15,4 +16,16 @@ class KenyaSafaricomUssdView(UssdView):
 
 @method_decorator((csrf_exempt, GhanaMtnUssdMiddleware), 'dispatch')
 class GhanaMtnUssdView(UssdView):
-	pass
\ No newline at end of file
+	pass
+
+
+
+@method_decorator(AsyncKenyaSafaricomUssdMiddleware, 'dispatch')
+class AsyncKenyaSafaricomUssdView(AsyncUssdView):
+	pass
+
+
+
+@method_decorator((csrf_exempt, AsyncGhanaMtnUssdMiddleware), 'dispatch')
+class AsyncGhanaMtnUssdView(AsyncUssdView):
+	pass
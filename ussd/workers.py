@@ -0,0 +1,67 @@
+import logging
+from django.utils import timezone
+from factory import notify
+from factory.workers import Worker, register
+from .models import PushBack, PushBackStatusEnum
+from .pushback import CONNECT_TIMEOUTS, READ_TIMEOUT, RETRYABLE_ERRORS, get_http_session, push
+
+logger = logging.getLogger(__name__)
+
+
+@register
+class PushbacksWorker(Worker):
+	"""Pushes queued screens back to the MTN Ghana gateway."""
+
+	queue = notify.PUSHBACKS
+
+	concurrency = 20
+
+	item_timeout = max(CONNECT_TIMEOUTS) + READ_TIMEOUT
+
+	def __init__(self, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.session = get_http_session(self.concurrency)
+
+	def fetch(self, limit):
+		return list(self.claim(PushBack, limit))
+
+	def send(self, item):
+		return push(self.session, item.url, item.payload, item.connect_timeout)
+
+	def process(self, pushbacks):
+		live = []
+		for item in pushbacks:
+			item.release() #cleared by whichever save() records the outcome
+			if item.is_expired:
+				#the gateway has given up on the session by now
+				item.status = PushBackStatusEnum.DEAD
+				item.notes = 'Expired'
+				item.save()
+			else:
+				live.append(item)
+
+		for item, future in self.submit(live, self.send):
+			try:
+				rv = future.result()
+			except RETRYABLE_ERRORS as exc:
+				logger.error(f'{repr(exc)}')
+				item.retry('Push Timed Out')
+				item.save()
+				continue
+			except Exception as exc:
+				logger.error(f'{repr(exc)}')
+				item.status = PushBackStatusEnum.ERRORED
+				item.notes = 'Error on Push'
+				item.save()
+				continue
+
+			if rv.ok:
+				item.status = PushBackStatusEnum.DELIVERED
+				item.notes = None
+				item.delivered_at = timezone.now()
+				item.save()
+				self.metrics.record_lag((item.delivered_at - item.created_at).total_seconds())
+			else:
+				logger.error('Push to %s failed. %s %s' % (item.url, rv.status_code, rv.text[:200]))
+				item.retry('Push Rejected %s' % (rv.status_code,))
+				item.save()